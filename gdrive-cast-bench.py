@@ -0,0 +1,275 @@
+import argparse
+import contextlib
+import io
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+
+import gdrive_cast_fakes
+import gdrive_cast_lib
+
+
+def make_video(n: int) -> SimpleNamespace:
+    return SimpleNamespace(id=f"video{n:06d}", title=f"Episode {n}", published="2025-01-01T10:00:00+00:00")
+
+
+def make_feed(feed_file: str, items: int, description_size: int):
+    rss = ET.Element("rss")
+    rss.set('version', '2.0')
+    rss.set('xmlns:itunes', 'http://www.itunes.com/dtds/podcast-1.0.dtd')
+    rss.set('xmlns:atom', 'http://www.w3.org/2005/Atom')
+    channel = ET.SubElement(rss, "channel")
+    ET.SubElement(channel, "title").text = "Benchmark channel"
+    ET.SubElement(channel, "description").text = "Synthetic feed"
+    description = ("Lorem ipsum dolor sit amet. " * (description_size // 28 + 1))[:description_size]
+    for n in range(items):
+        channel.append(gdrive_cast_lib.build_feed_item(make_video(n), description, f"https://example.com/{n}", 12345678))
+    tree = ET.ElementTree(rss)
+    ET.indent(tree, space="\t", level=0)
+    tree.write(feed_file, encoding="utf-8", xml_declaration=True)
+
+
+def legacy_append(feed_file: str, item: ET.Element):
+    # what create_or_append_feed_file did before: parse, append, indent and rewrite the whole feed
+    tree = ET.parse(feed_file)
+    tree.getroot().find('channel').append(item)
+    ET.indent(tree, space="\t", level=0)
+    tree.write(feed_file, encoding="utf-8", xml_declaration=True)
+
+
+def time_appends(append, feed_file: str, appends: int, description_size: int) -> float:
+    description = "x" * description_size
+    started = time.perf_counter()
+    for n in range(appends):
+        item = gdrive_cast_lib.build_feed_item(make_video(1_000_000 + n), description, f"https://example.com/new{n}", 1)
+        append(feed_file, item)
+    return (time.perf_counter() - started) / appends
+
+
+def bench_feed(args):
+    ET.register_namespace('itunes', 'http://www.itunes.com/dtds/podcast-1.0.dtd')
+    work_dir = tempfile.mkdtemp(prefix="gdrive-cast-bench-")
+    try:
+        print(f"{'items':>8} {'feed size':>10} {'legacy ms/append':>17} {'streaming ms/append':>20} {'speedup':>8}")
+        for items in args.sizes:
+            base = os.path.join(work_dir, f"feed-{items}.xml")
+            make_feed(base, items, args.description_size)
+            size = os.path.getsize(base)
+
+            legacy_file = base + ".legacy"
+            shutil.copyfile(base, legacy_file)
+            legacy = time_appends(legacy_append, legacy_file, args.appends, args.description_size)
+
+            streaming_file = base + ".streaming"
+            shutil.copyfile(base, streaming_file)
+            streaming = time_appends(gdrive_cast_lib.append_feed_item, streaming_file, args.appends, args.description_size)
+
+            print(f"{items:>8} {gdrive_cast_lib.humanize.naturalsize(size, binary=True):>10} "
+                  f"{legacy * 1000:>17.3f} {streaming * 1000:>20.3f} {legacy / streaming:>7.0f}x")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+HEAVY_MODULES = ["gdrive_cast_lib", "pydrive2.drive", "googleapiclient.discovery", "youtube_transcript_api", "litellm"]
+
+# every command is stopped at its first line of output, so the download never gets to upload anything
+STARTUP_COMMANDS = [
+    ["--help"],
+    ["--list"],
+    ["--queue-status"],
+    ["--refresh-index"],
+    ["--sync", "--dry-run"],
+    ["--purge", "1", "--dry-run"],
+    ["--delete", "1", "--dry-run"],
+    ["--show-timestamps", "https://www.youtube.com/watch?v=jNQXAC9IVRw"],
+    ["https://www.youtube.com/watch?v=jNQXAC9IVRw"],
+]
+
+
+def time_import(module: str) -> float:
+    # a fresh interpreter per module, so nothing is imported already
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - started
+
+
+def time_to_first_output(args: list[str], timeout: float) -> float | None:
+    # starts the CLI and measures until it prints its first line, then stops it
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "gdrive-cast-cmd.py"] + args,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+    try:
+        line = process.stdout.readline()
+        return time.perf_counter() - started if line else None
+    finally:
+        process.kill()
+        process.wait(timeout)
+
+
+def bench_startup(args):
+    baseline = time_import("sys")
+    print(f"{'module':<28} {'import s':>9}")
+    for module in HEAVY_MODULES:
+        print(f"{module:<28} {time_import(module) - baseline:>9.3f}")
+
+    print()
+    print(f"{'command':<40} {'first output s':>15}")
+    for command in STARTUP_COMMANDS:
+        elapsed = time_to_first_output(command, args.timeout)
+        result = f"{elapsed:>15.3f}" if elapsed is not None else f"{'no output':>15}"
+        print(f"{' '.join(command)[:40]:<40} {result}")
+
+
+OFFLINE_CONFIG = """[app]
+youtube_process_command = {converter} convert {{video_id}} -o {{output_file}} --size {audio_size} --seconds {convert_seconds}
+batch_process_workers = 2
+batch_upload_workers = 4
+feed_download_workers = 8
+upload_chunk_size_mb = 1
+upload_max_retries = 5
+delete_workers = 8
+"""
+
+
+def seed_library(backend: gdrive_cast_fakes.FakeBackend, youtube: gdrive_cast_fakes.FakeYouTube,
+                 channels: int, episodes: int) -> list[str]:
+    # root folder, one folder per channel with small audio files and a feed listing them
+    root_id = backend.add_folder("gdrive-cast")
+    channel_ids = []
+    for c in range(channels):
+        channel_id = f"UCbench{c:06d}"
+        youtube.add_channel(channel_id, f"Channel {c}")
+        folder_id = backend.add_folder(channel_id, root_id)
+
+        rss = ET.Element("rss")
+        rss.set('version', '2.0')
+        rss.set('xmlns:itunes', 'http://www.itunes.com/dtds/podcast-1.0.dtd')
+        channel = ET.SubElement(rss, "channel")
+        ET.SubElement(channel, "title").text = f"Channel {c}"
+        ET.SubElement(channel, "description").text = "Synthetic channel"
+        for n in range(episodes):
+            video_id = f"c{c:06d}e{n:04d}"
+            youtube.add_video(video_id, channel_id, f"Episode {n}")
+            file_id = backend.add_file(f"{video_id}.mp3", folder_id, gdrive_cast_fakes.synthetic_audio(video_id, 1024))
+            link = f"https://drive.usercontent.google.com/download?export=download&confirm=t&id={file_id}"
+            channel.append(gdrive_cast_lib.build_feed_item(
+                gdrive_cast_lib.YouTubeVideo(youtube.video_items[video_id]), "Synthetic episode", link, 1024))
+        ET.indent(rss, space="\t", level=0)
+        backend.add_file(gdrive_cast_lib.FEED_FILE_NAME, folder_id, ET.tostring(rss, encoding="utf-8", xml_declaration=True))
+        channel_ids.append(channel_id)
+    return channel_ids
+
+
+def measure(backend: gdrive_cast_fakes.FakeBackend, operation):
+    # runs the operation with its output suppressed; returns (seconds, drive calls, youtube calls)
+    backend.reset_counters()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        operation()
+    elapsed = time.perf_counter() - started
+    drive = sum(n for name, n in backend.calls.items() if name.startswith("drive."))
+    youtube = sum(n for name, n in backend.calls.items() if name.startswith("youtube."))
+    return elapsed, drive, youtube
+
+
+def bench_offline_size(args, channels: int):
+    backend = gdrive_cast_fakes.FakeBackend(latency=args.latency_ms / 1000, failure_rate=args.failure_rate)
+    manager = gdrive_cast_lib.PodcastManager()
+    youtube = gdrive_cast_fakes.install_fakes(manager, backend)
+    channel_ids = seed_library(backend, youtube, channels, args.episodes)
+
+    # new uploads for the download benchmark, spread over the channels
+    new_video_ids = []
+    for n in range(args.max_downloads):
+        video_id = f"new{n:06d}"
+        youtube.add_video(video_id, channel_ids[n % len(channel_ids)], f"New episode {n}")
+        new_video_ids.append(video_id)
+
+    def append():
+        video = gdrive_cast_lib.YouTubeVideo(youtube.video_items[new_video_ids[0]])
+        channel = gdrive_cast_lib.YouTubeChannel(youtube.channel_items[video.channel_id])
+        folder = manager.get_or_create_folder(video.channel_id, manager.root['id'])
+        manager.create_or_append_feed_file(f"{gdrive_cast_lib.FEED_CACHE_FOLDER}/{folder['id']}.xml", folder['id'],
+                                           channel, video, "https://example.com/new", args.audio_size, False)
+
+    failed = []
+
+    def download():
+        items = manager.download_podcasts(
+            [f"https://www.youtube.com/watch?v={video_id}" for video_id in new_video_ids], False)
+        failed.extend(item for item in items if not item.ok)
+
+    operations = [
+        ("list (cold)", manager.fetch_library_data),
+        ("list (warm)", manager.fetch_library_data),
+        ("append episode", append),
+        (f"download {len(new_video_ids)}", download),
+        ("purge channel", lambda: manager.purge_podcast(1)),
+    ]
+    for name, operation in operations:
+        elapsed, drive, youtube_calls = measure(backend, operation)
+        print(f"{channels:>8} {name:<16} {elapsed:>8.3f} {drive:>7} {youtube_calls:>8} "
+              f"{gdrive_cast_lib.humanize.naturalsize(backend.bytes_up, binary=True):>10} "
+              f"{gdrive_cast_lib.humanize.naturalsize(backend.bytes_down, binary=True):>10}")
+    if failed:
+        print(f"{len(failed)} download(s) failed, first error: {failed[0].error}", file=sys.stderr)
+
+
+def bench_offline(args):
+    # every size runs in its own empty folder, so local caches and the index start cold
+    converter = f"{shlex.quote(sys.executable)} {shlex.quote(os.path.abspath(gdrive_cast_fakes.__file__))}"
+    work_dir = tempfile.mkdtemp(prefix="gdrive-cast-bench-")
+    cwd = os.getcwd()
+    try:
+        print(f"{'channels':>8} {'operation':<16} {'seconds':>8} {'drive':>7} {'youtube':>8} {'up':>10} {'down':>10}")
+        for channels in args.sizes:
+            size_dir = os.path.join(work_dir, str(channels))
+            os.makedirs(size_dir)
+            with open(os.path.join(size_dir, "config.ini"), "w", encoding="utf-8") as f:
+                f.write(OFFLINE_CONFIG.format(converter=converter, audio_size=args.audio_size,
+                                              convert_seconds=args.convert_seconds))
+            os.chdir(size_dir)
+            try:
+                bench_offline_size(args, channels)
+            finally:
+                os.chdir(cwd)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def run_program():
+    parser = argparse.ArgumentParser(prog='GDrive Cast benchmarks', description='Offline performance benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    feed = commands.add_parser('feed', help="Cost of appending one episode to feeds of growing size.")
+    feed.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000], help="Number of items in the feed.")
+    feed.add_argument('--appends', type=int, default=20, help="Appends measured per feed size.")
+    feed.add_argument('--description-size', type=int, default=2000, help="Length of each episode description.")
+    feed.set_defaults(func=bench_feed)
+
+    startup = commands.add_parser('startup', help="Import time of heavy modules and time to first output of CLI commands.")
+    startup.add_argument('--timeout', type=float, default=30, help="Seconds to wait for a command to stop.")
+    startup.set_defaults(func=bench_startup)
+
+    offline = commands.add_parser('offline', help="End-to-end operations against in-memory fake Drive and YouTube backends.")
+    offline.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000], help="Number of channels in the library.")
+    offline.add_argument('--episodes', type=int, default=20, help="Episodes per channel.")
+    offline.add_argument('--latency-ms', type=float, default=20, help="Simulated latency of every API request.")
+    offline.add_argument('--failure-rate', type=float, default=0, help="Share of API requests that fail with a retryable error.")
+    offline.add_argument('--max-downloads', type=int, default=20, help="New videos downloaded per library size.")
+    offline.add_argument('--audio-size', type=int, default=2 * 1024 * 1024, help="Size of each converted MP3 in bytes.")
+    offline.add_argument('--convert-seconds', type=float, default=0.2, help="Simulated conversion time per video.")
+    offline.set_defaults(func=bench_offline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    run_program()
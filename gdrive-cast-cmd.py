@@ -16,20 +16,59 @@ def list_podcasts(manager: PodcastManager):
             print(f" - {episode['title']}")
 
 def run_program():
-    manager = PodcastManager()
-
     parser = argparse.ArgumentParser(prog='GDrive Cast ' + gdrive_cast_lib.VERSION, description='Host a podcast on Google Drive')
-    parser.add_argument('video_url', nargs='?', default="")
+    parser.add_argument('video_urls', nargs='*', metavar='video_url',
+                        help="One or more video URLs. Playlist URLs (https://www.youtube.com/playlist?list=ID) are expanded to all their videos.")
+    parser.add_argument("-f", "--file", help="Read video / playlist URLs from a file (one per line, '#' starts a comment).")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Batch mode: number of concurrent converter processes (default: batch_process_workers in config.ini).")
+    parser.add_argument("-uj", "--upload-jobs", type=int,
+                        help="Batch mode: number of concurrent Drive uploads (default: batch_upload_workers in config.ini).")
     parser.add_argument("-l", "--list", help="List existing podcast channels and exit.", action="store_true")
     parser.add_argument("-d", "--delete", help="Delete a channel by its index (starts with 1).")
     parser.add_argument("-p", "--purge", help="Purge a channel by index (starts with 1) (delete all episodes but keep the channel).")
+    parser.add_argument("-s", "--sync", help="Download new uploads of every channel that already has a podcast and exit.", action="store_true")
+    parser.add_argument("--dry-run", help="With --sync, --delete or --purge: only show what would be downloaded or removed.", action="store_true")
+    parser.add_argument("--refresh-index", help="Validate the local Drive index against Google Drive, fix stale entries and exit.", action="store_true")
     parser.add_argument("-st", "--show-timestamps",
                         help="Generate and print timestamps for a video URL. Can be used for testing before embedding them into a podcast.")
     parser.add_argument("-adt", "--add-generated-timestamps",
                         help="When downloading a new video, generate and insert chapters with timestamps into podcast description. Reqiures an LLM API key.",
                         action="store_true")
+    parser.add_argument("--no-cache", help="Ignore cached transcripts and chapters, and replace them with fresh results. Also converts and uploads episodes whose audio is already on Drive.",
+                        action="store_true")
+    parser.add_argument("-q", "--queue", help="Add the videos to the job queue instead of downloading them now (see --worker).",
+                        action="store_true")
+    parser.add_argument("--worker", help="Run queued jobs until interrupted (-j sets the number of workers, default: job_workers in config.ini). Interrupted jobs resume from their last completed stage.",
+                        action="store_true")
+    parser.add_argument("--exit-when-idle", help="With --worker: exit when the queue is empty.", action="store_true")
+    parser.add_argument("--queue-status", help="Show the most recent jobs of the queue and exit.", action="store_true")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write timed spans of the run (auth, metadata, conversion, uploads, feeds, LLM) with their Drive / YouTube requests to a JSON trace file (Chrome trace format).")
+    parser.add_argument("--trace-summary", help="Print a table of time, requests and bytes per span at the end of the run.",
+                        action="store_true")
     args = parser.parse_args()
 
+    # cheap to create: authentication and API clients are set up on first use
+    manager = PodcastManager()
+    manager.bypass_cache = args.no_cache
+
+    tracer = gdrive_cast_lib.tracer
+    tracer.enabled = bool(args.trace or args.trace_summary)
+    try:
+        with tracer.span("command", argv=sys.argv[1:]):
+            run_command(manager, args)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+            print(f"Trace written: {args.trace}")
+        if args.trace_summary:
+            tracer.print_summary()
+        if manager.api.quota_used:
+            print(manager.api.quota_report())
+
+
+def run_command(manager: PodcastManager, args):
     config = configparser.ConfigParser()
     config.read('config.ini')
 
@@ -37,25 +76,65 @@ def run_program():
         list_podcasts(manager)
         sys.exit(0)
 
+    if args.sync:
+        items = manager.sync_channels(args.add_generated_timestamps, dry_run=args.dry_run)
+        if items:
+            gdrive_cast_lib.print_batch_summary(items)
+        sys.exit(0 if all(item.ok for item in items) else -1)
+
+    if args.refresh_index:
+        manager.refresh_index()
+        sys.exit(0)
+
+    if args.queue_status:
+        gdrive_cast_lib.print_job_status(manager.jobs.list())
+        sys.exit(0)
+
+    if args.worker:
+        manager.run_worker(args.jobs or config.getint('app', 'job_workers', fallback=2), exit_when_idle=args.exit_when_idle)
+        sys.exit(0)
+
     if args.show_timestamps:
         print(manager.get_timestamps(args.show_timestamps))
         sys.exit(0)
 
     if args.delete:
-        manager.delete_podcast(int(args.delete))
-        print(f"Deleted podcast / channel folder: {args.delete}")
+        if not manager.delete_podcast(int(args.delete), dry_run=args.dry_run):
+            sys.exit(-1)
+        if not args.dry_run:
+            print(f"Deleted podcast / channel folder: {args.delete}")
         sys.exit(0)
 
     if args.purge:
-        manager.purge_podcast(int(args.purge))
-        print(f"Purged podcast / channel folder: {args.delete}")
+        if not manager.purge_podcast(int(args.purge), dry_run=args.dry_run):
+            print(f"Purge incomplete, run it again to retry: {args.purge}")
+            sys.exit(-1)
+        if not args.dry_run:
+            print(f"Purged podcast / channel folder: {args.purge}")
         sys.exit(0)
 
-    if not args.video_url:
+    sources = list(args.video_urls)
+    if args.file:
+        sources.extend(gdrive_cast_lib.read_url_file(args.file))
+
+    if not sources:
         print("Video URL is required")
         sys.exit(-1)
 
-    manager.download_podcast(args.video_url, args.add_generated_timestamps)
+    if args.queue:
+        items = manager.enqueue(sources, args.add_generated_timestamps)
+        gdrive_cast_lib.print_batch_summary(items)
+        sys.exit(0 if all(item.ok for item in items) else -1)
+
+    if len(sources) == 1 and not args.file and not gdrive_cast_lib.extract_playlist_id(sources[0]):
+        manager.download_podcast(sources[0], args.add_generated_timestamps)
+        return
+
+    items = manager.download_podcasts(sources, args.add_generated_timestamps,
+                                      process_workers=args.jobs, upload_workers=args.upload_jobs)
+    gdrive_cast_lib.print_batch_summary(items)
+    if not all(item.ok for item in items):
+        sys.exit(-1)
 
 
 if __name__ == "__main__":
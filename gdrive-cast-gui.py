@@ -4,38 +4,121 @@ from gdrive_cast_lib import PodcastManager
 
 mgr = None
 
-@ui.refreshable
-async def render_podcast_list():
+JOB_COLUMNS = [
+    {'name': 'id', 'label': 'Job', 'field': 'id'},
+    {'name': 'video', 'label': 'Video', 'field': 'video', 'align': 'left'},
+    {'name': 'status', 'label': 'Status', 'field': 'status'},
+    {'name': 'stage', 'label': 'Stage', 'field': 'stage'},
+    {'name': 'error', 'label': 'Error', 'field': 'error', 'align': 'left'},
+]
 
-    with ui.column().classes('w-full items-center') as loader:
-        ui.spinner(size='lg')
-        ui.label('Fetching data from GDrive...')
 
-    try:
-        data = await run.io_bound(mgr.fetch_library_data)
+class ChannelList:
+    # Channels shown on the page, by folder ID. Each channel is rendered as a collapsed
+    # expansion; its episode rows are only built when it is opened for the first time.
 
-        loader.set_visibility(False)  # Hide spinner
+    def __init__(self, container):
+        self.container = container
+        self.channels = {}
 
-        if not data:
-            ui.label('No podcasts found.')
+    def show(self, pod):
+        current = self.channels.get(pod['id'])
+        if current and current['pod']['version'] == pod['version'] and current['pod']['position'] == pod['position']:
             return
+        if current:
+            self.container.remove(current['expansion'])
+
+        with self.container:
+            expansion = ui.expansion(pod['title'], icon='mic').classes('w-full border rounded mb-2')
+        expansion.on_value_change(lambda e, pod=pod, expansion=expansion: self._render_episodes(expansion, pod, e.value))
+        self.channels[pod['id']] = {'pod': pod, 'expansion': expansion, 'rendered': False}
+
+        # keep the channels in listing order
+        index = sum(1 for c in self.channels.values() if c['pod']['position'] < pod['position'])
+        expansion.move(self.container, index)
+
+    def remove_missing(self, ids):
+        for channel_id in list(self.channels):
+            if channel_id not in ids:
+                self.container.remove(self.channels.pop(channel_id)['expansion'])
+
+    def pods(self):
+        return sorted((c['pod'] for c in self.channels.values()), key=lambda pod: pod['position'])
+
+    def _render_episodes(self, expansion, pod, opened):
+        channel = self.channels.get(pod['id'])
+        if not opened or not channel or channel['rendered']:
+            return
+        channel['rendered'] = True
+        with expansion:
+            if not pod['episodes']:
+                ui.label('No episodes.').classes('p-2 text-gray-500')
+            for ep in pod['episodes']:
+                with ui.row().classes('w-full items-center justify-between p-2 border-t'):
+                    ui.label(ep['title']).classes('font-medium')
+                    ui.label(ep['date']).classes('text-xs text-gray-500')
+
+
+async def render_podcast_list(channel_list: ChannelList, spinner, status):
+    # show the last known library right away, then patch in the channels that changed
+    for pod in mgr.load_library_cache():
+        channel_list.show(pod)
 
-        for pod in data:
-            with ui.expansion(pod['title'], icon='mic').classes('w-full border rounded mb-2'):
-                for ep in pod['episodes']:
-                    with ui.row().classes('w-full items-center justify-between p-2 border-t'):
-                        ui.label(ep['title']).classes('font-medium')
-                        ui.label(ep['date']).classes('text-xs text-gray-500')
+    status.set_text('Refreshing from GDrive...' if channel_list.channels else 'Fetching data from GDrive...')
+    try:
+        library = mgr.iter_library_data()
+        seen = set()
+        while (pod := await run.io_bound(next, library, None)) is not None:
+            seen.add(pod['id'])
+            channel_list.show(pod)
+        channel_list.remove_missing(seen)
+        mgr.save_library_cache(channel_list.pods())
+
+        status.set_text('' if channel_list.channels else 'No podcasts found.')
     except Exception as e:
-        loader.set_visibility(False)
-        ui.label(f'Error: {e}').classes('text-red')
+        status.set_text(f'Error: {e}')
+        status.classes('text-red')
+    finally:
+        spinner.set_visibility(False)
+
+
+async def enqueue(url_input):
+    # the jobs are run by a worker process: gdrive-cast-cmd.py --worker
+    url = url_input.value.strip()
+    if not url:
+        return
+    items = await run.io_bound(mgr.enqueue, [url], False)
+    failed = [item for item in items if item.error]
+    if failed:
+        ui.notify(f'Not queued: {failed[0].error}', type='negative')
+    else:
+        ui.notify(f'Queued {len(items)} video(s)', type='positive')
+        url_input.set_value('')
+
+
+async def refresh_jobs(jobs_table):
+    jobs = await run.io_bound(mgr.jobs.list, 20)
+    jobs_table.rows = [{**job, 'video': job['title'] or job['video_id'], 'error': job['error'] or ''} for job in jobs]
+    jobs_table.update()
 
 
 @ui.page('/')
 async def index():
     with ui.column().classes('w-full max-w-3xl mx-auto p-4'):
         ui.label('GDrive Cast GUI').classes('text-h4 mb-4')
-        ui.timer(0.1, render_podcast_list, once=True)
+        with ui.row().classes('items-center'):
+            spinner = ui.spinner(size='sm')
+            status = ui.label('Loading...')
+        channel_list = ChannelList(ui.column().classes('w-full'))
+
+        ui.label('Job queue').classes('text-h6 mt-4')
+        with ui.row().classes('w-full items-center'):
+            url_input = ui.input('YouTube video or playlist URL').classes('flex-grow')
+            ui.button('Queue', on_click=lambda: enqueue(url_input))
+        jobs_table = ui.table(columns=JOB_COLUMNS, rows=[], row_key='id').classes('w-full')
+
+    ui.timer(0.1, lambda: render_podcast_list(channel_list, spinner, status), once=True)
+    ui.timer(5, lambda: refresh_jobs(jobs_table))
 
 
 @app.on_startup
@@ -46,4 +129,4 @@ def startup():
 
 
 if __name__ in {"__main__", "__mp_main__"}:
-    ui.run(title="GDrive Cast", native=True, reload=False)
\ No newline at end of file
+    ui.run(title="GDrive Cast", native=True, reload=False)
@@ -0,0 +1,413 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+# In-process fakes of the Google Drive (PyDrive2) and YouTube Data API surface used by
+# gdrive_cast_lib, for offline benchmarks. Every request is counted, and can be slowed
+# down by a fixed latency and a bandwidth limit, or fail at random with retryable server errors.
+#
+# Run as a script, this module is also a fake converter that stands in for yt-dlp:
+#   python gdrive_cast_fakes.py convert {video_id} -o {output_file} --size 1000000
+
+FOLDER_TYPE = "application/vnd.google-apps.folder"
+
+
+class FakeBackend:
+
+    def __init__(self, latency: float = 0.0, bandwidth: float | None = None, failure_rate: float = 0.0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.calls = Counter()
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.files = {}
+        self.contents = {}
+        self.sessions = {}
+        self.permissions = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def request(self, name: str, sent: int = 0, received: int = 0):
+        # one simulated round trip; raises a 503 error for a failure_rate share of the requests
+        with self._lock:
+            self.calls[name] += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.calls['failed'] += 1
+            else:
+                self.bytes_up += sent
+                self.bytes_down += received
+        delay = self.latency
+        if self.bandwidth and not failed:
+            delay += (sent + received) / self.bandwidth
+        if delay:
+            time.sleep(delay)
+        if failed:
+            error = http_error(503, "backendError")
+            if name.startswith("drive."):
+                from pydrive2.files import ApiRequestError
+                raise ApiRequestError(error)
+            raise error
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_up = self.bytes_down = 0
+
+    # --- Drive storage ---
+
+    def store(self, file_id: str | None, metadata: dict, content: bytes | None) -> dict:
+        with self._lock:
+            if file_id is None:
+                file_id = uuid.uuid4().hex
+                stored = {'id': file_id, 'parents': [], 'mimeType': None}
+            elif file_id in self.files:
+                stored = self.files[file_id]
+            else:
+                raise not_found_error(file_id)
+
+            for key in ('title', 'parents', 'mimeType'):
+                if metadata.get(key) is not None:
+                    stored[key] = metadata[key]
+            stored['parents'] = [{'id': p['id']} for p in stored.get('parents') or []]
+            if content is not None:
+                self.contents[file_id] = content
+                stored['md5Checksum'] = hashlib.md5(content).hexdigest()
+                stored['fileSize'] = str(len(content))
+                if not stored.get('mimeType'):
+                    stored['mimeType'] = mimetypes.guess_type(stored.get('title', ''))[0] or 'application/octet-stream'
+            stored['modifiedDate'] = datetime.now(timezone.utc).isoformat()
+            self.files[file_id] = stored
+            return dict(stored)
+
+    def add_folder(self, title: str, parent_id: str = 'root') -> str:
+        return self.store(None, {'title': title, 'parents': [{'id': parent_id}], 'mimeType': FOLDER_TYPE}, None)['id']
+
+    def add_file(self, title: str, parent_id: str, content: bytes) -> str:
+        return self.store(None, {'title': title, 'parents': [{'id': parent_id}]}, content)['id']
+
+    def content(self, file_id: str) -> bytes:
+        if file_id not in self.contents:
+            raise not_found_error(file_id)
+        return self.contents[file_id]
+
+    def delete(self, file_id: str):
+        with self._lock:
+            if file_id not in self.files:
+                raise not_found_error(file_id)
+            # deleting a folder deletes everything in it
+            doomed = [file_id]
+            while doomed:
+                current = doomed.pop()
+                self.files.pop(current, None)
+                self.contents.pop(current, None)
+                doomed.extend(f['id'] for f in self.files.values() if any(p['id'] == current for p in f['parents']))
+
+    def query(self, q: str) -> list[dict]:
+        # supports the query forms used by gdrive_cast_lib: title, parents and mimeType conditions
+        # combined with and / or / parentheses
+        with self._lock:
+            return [dict(f) for f in self.files.values() if query_matches(q, f)]
+
+
+def query_matches(q: str, f: dict) -> bool:
+    # each condition is replaced by its value for the file, what is left is a boolean expression
+    parents = {p['id'] for p in f['parents']}
+    conditions = [
+        (r"title\s*=\s*'([^']*)'", lambda m: f.get('title') == m.group(1)),
+        (r"title\s+contains\s+'([^']*)'", lambda m: m.group(1) in f.get('title', '')),
+        (r"mimeType\s*=\s*'([^']*)'", lambda m: f.get('mimeType') == m.group(1)),
+        (r"'([^']+)' in parents", lambda m: m.group(1) in parents),
+        (r"trashed\s*=\s*false", lambda m: True),
+    ]
+    for pattern, test in conditions:
+        q = re.sub(pattern, lambda m: str(test(m)), q)
+    return eval(q, {'__builtins__': {}})
+
+
+def http_error(status: int, reason: str, message: str = "") -> Exception:
+    from googleapiclient.errors import HttpError
+    import httplib2
+
+    content = json.dumps({'error': {'code': status, 'message': message or reason,
+                                    'errors': [{'reason': reason, 'message': message or reason}]}}).encode()
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+def not_found_error(file_id: str) -> Exception:
+    # the same exception PyDrive2 raises for a missing file
+    from pydrive2.files import ApiRequestError
+    return ApiRequestError(http_error(404, "notFound", f"File not found: {file_id}"))
+
+
+class FakeDriveFile(dict):
+    # subset of pydrive2.files.GoogleDriveFile
+
+    def __init__(self, backend: FakeBackend, metadata: dict | None = None, uploaded: bool = False):
+        super().__init__(metadata or {})
+        self.backend = backend
+        self.metadata = dict(self)
+        self.uploaded = uploaded
+        self._content = None
+
+    def UpdateMetadata(self, metadata: dict | None = None):
+        if metadata:
+            self.update(metadata)
+        self.metadata = dict(self)
+
+    def SetContentFile(self, filename: str):
+        with open(filename, "rb") as f:
+            self._content = f.read()
+
+    def SetContentString(self, content: str, encoding: str = "utf-8"):
+        self._content = content.encode(encoding)
+
+    def Upload(self, param=None):
+        sent = len(self._content) if self._content is not None else 0
+        self.backend.request('drive.files.update' if self.get('id') else 'drive.files.insert', sent=sent)
+        self.UpdateMetadata(self.backend.store(self.get('id'), dict(self), self._content))
+        self.uploaded = True
+        self._content = None
+
+    def GetContentFile(self, filename: str, mimetype=None, remove_bom=False, callback=None, chunksize=None, acknowledge_abuse=False):
+        content = self.backend.content(self['id'])
+        self.backend.request('drive.files.get_media', received=len(content))
+        with open(filename, "wb") as f:
+            f.write(content)
+
+    def Delete(self, param=None):
+        self.backend.request('drive.files.delete')
+        self.backend.delete(self['id'])
+
+    def InsertPermission(self, new_permission: dict, param=None):
+        self.backend.request('drive.permissions.insert')
+        with self.backend._lock:
+            self.backend.permissions.setdefault(self['id'], []).append(new_permission)
+        return new_permission
+
+    def GetPermissions(self) -> list[dict]:
+        self.backend.request('drive.permissions.list')
+        with self.backend._lock:
+            return list(self.backend.permissions.get(self['id'], []))
+
+
+class FakeFileList:
+
+    def __init__(self, backend: FakeBackend, param: dict):
+        self.backend = backend
+        self.param = param
+
+    def GetList(self) -> list[FakeDriveFile]:
+        self.backend.request('drive.files.list')
+        return [FakeDriveFile(self.backend, f, uploaded=True) for f in self.backend.query(self.param.get('q', ''))]
+
+
+class FakeDrive:
+    # subset of pydrive2.drive.GoogleDrive
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def CreateFile(self, metadata: dict | None = None) -> FakeDriveFile:
+        return FakeDriveFile(self.backend, metadata)
+
+    def ListFile(self, param: dict | None = None) -> FakeFileList:
+        return FakeFileList(self.backend, param or {})
+
+
+class FakeResponse(dict):
+    # httplib2.Response: a dict of lower-case headers with a status
+
+    def __init__(self, status: int, headers: dict | None = None):
+        super().__init__(headers or {})
+        self.status = status
+
+
+class FakeHttp:
+    # the Drive v2 resumable upload protocol, as used by gdrive_cast_lib.ResumableUpload
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def request(self, uri, method="GET", body=None, headers=None):
+        headers = headers or {}
+        query = parse_qs(urlparse(uri).query)
+        if query.get('uploadType') == ['resumable']:
+            try:
+                self.backend.request('drive.upload.start')
+            except Exception:
+                return FakeResponse(503), b""
+            path = urlparse(uri).path.rstrip("/")
+            file_id = None if path.endswith("/files") else path.rsplit("/", 1)[1]
+            if file_id and file_id not in self.backend.files:
+                return FakeResponse(404), b'{"error": {"code": 404}}'
+            session = uuid.uuid4().hex
+            self.backend.sessions[session] = {'file_id': file_id, 'metadata': json.loads(body or "{}"), 'data': bytearray()}
+            return FakeResponse(200, {'location': f"https://fake.upload/{session}"}), b""
+
+        session = self.backend.sessions.get(urlparse(uri).path.strip("/"))
+        if session is None:
+            return FakeResponse(404), b""
+        body = body or b""
+        try:
+            self.backend.request('drive.upload.chunk', sent=len(body))
+        except Exception:
+            return FakeResponse(503), b""
+
+        content_range = headers.get('Content-Range', "")
+        match = re.match(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", content_range)
+        start, total = match.group(1), match.group(3)
+        if start is not None:
+            if int(start) != len(session['data']):
+                return FakeResponse(400), b"unexpected offset"
+            session['data'] += body
+        if total != "*" and len(session['data']) == int(total):
+            stored = self.backend.store(session['file_id'], session['metadata'], bytes(session['data']))
+            return FakeResponse(200), json.dumps(stored).encode()
+        received = len(session['data'])
+        return FakeResponse(308, {'range': f"bytes=0-{received - 1}"} if received else {}), b""
+
+
+class FakeAuth:
+    # subset of pydrive2.auth.GoogleAuth
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.credentials = None
+
+    def Get_Http_Object(self) -> FakeHttp:
+        return FakeHttp(self.backend)
+
+
+class FakeYouTube:
+    # subset of the googleapiclient YouTube Data API v3 client
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.video_items = {}
+        self.channel_items = {}
+        self.uploads = {}
+
+    def add_channel(self, channel_id: str, title: str):
+        self.channel_items[channel_id] = {
+            'id': channel_id,
+            'snippet': {'title': title, 'description': f"Description of {title}"},
+            'brandingSettings': {'image': {'bannerExternalUrl': f"https://example.com/{channel_id}.jpg"}},
+        }
+        self.uploads.setdefault("UU" + channel_id[2:], [])
+
+    def add_video(self, video_id: str, channel_id: str, title: str, published: str = "2025-01-01T10:00:00+00:00"):
+        self.video_items[video_id] = {
+            'id': video_id,
+            'snippet': {
+                'title': title, 'description': f"Description of {title}", 'publishedAt': published,
+                'thumbnails': {'standard': {'url': f"https://example.com/{video_id}.jpg"}},
+                'channelId': channel_id, 'channelTitle': self.channel_items[channel_id]['snippet']['title'],
+            },
+        }
+        # the uploads playlist lists the newest video first
+        self.uploads["UU" + channel_id[2:]].insert(0, {'contentDetails': {'videoId': video_id, 'videoPublishedAt': published}})
+
+    def videos(self):
+        return FakeYouTubeResource(self, 'videos', self.video_items)
+
+    def channels(self):
+        return FakeYouTubeResource(self, 'channels', self.channel_items)
+
+    def playlistItems(self):
+        return FakeYouTubeResource(self, 'playlistItems', None)
+
+
+class FakeYouTubeResource:
+
+    def __init__(self, youtube: FakeYouTube, name: str, items: dict | None):
+        self.youtube = youtube
+        self.name = name
+        self.items = items
+
+    def list(self, **params):
+        return FakeYouTubeRequest(self, params)
+
+
+class FakeYouTubeRequest:
+
+    def __init__(self, resource: FakeYouTubeResource, params: dict):
+        self.resource = resource
+        self.params = params
+        self.headers = {}
+
+    def execute(self) -> dict:
+        backend = self.resource.youtube.backend
+        backend.request(f"youtube.{self.resource.name}.list")
+        if self.resource.items is not None:
+            ids = self.params['id'].split(",")
+            return {'items': [self.resource.items[i] for i in ids if i in self.resource.items]}
+
+        playlist = self.resource.youtube.uploads.get(self.params['playlistId'], [])
+        page_size = self.params.get('maxResults', 5)
+        start = int(self.params.get('pageToken') or 0)
+        etag = hashlib.md5(json.dumps(playlist[start:start + page_size]).encode()).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            raise http_error(304, "notModified")
+        response = {'etag': etag, 'items': playlist[start:start + page_size]}
+        if start + page_size < len(playlist):
+            response['nextPageToken'] = str(start + page_size)
+        return response
+
+
+def install_fakes(manager, backend: FakeBackend) -> FakeYouTube:
+    # replaces the Google clients of a PodcastManager; returns the fake YouTube client to add videos to
+    youtube = FakeYouTube(backend)
+    manager.gauth = FakeAuth(backend)
+    manager.drive = FakeDrive(backend)
+    manager.youtube = youtube
+    return youtube
+
+
+def synthetic_audio(video_id: str, size: int) -> bytes:
+    # an ID3 header followed by deterministic noise
+    header = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+    return header + random.Random(video_id).randbytes(max(0, size - len(header)))
+
+
+def convert(args):
+    time.sleep(args.seconds)
+    data = synthetic_audio(args.video_id, args.size)
+    if args.output == "-":
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "wb") as f:
+            f.write(data)
+
+
+def run_program():
+    parser = argparse.ArgumentParser(prog='GDrive Cast fakes', description='Fake external tools for offline benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    converter = commands.add_parser('convert', help="Stand-in for yt-dlp: writes synthetic MP3 data.")
+    converter.add_argument('video_id')
+    converter.add_argument('-o', '--output', required=True, help="Output file, or '-' for stdout.")
+    converter.add_argument('--size', type=int, default=1024 * 1024, help="Size of the audio in bytes.")
+    converter.add_argument('--seconds', type=float, default=0.0, help="Simulated conversion time.")
+    converter.set_defaults(func=convert)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    run_program()
@@ -1,22 +1,40 @@
+from __future__ import annotations
+
 import configparser
-from datetime import datetime
+import copy
+import functools
+import hashlib
+import json
+import mimetypes
+from datetime import datetime, timedelta, timezone
 import os
+import random
+import re
 import shlex
+import sqlite3
 import subprocess
 import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
-from email.utils import format_datetime
-from typing import Iterable
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import TYPE_CHECKING, Iterable
 from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
 
+import httplib2
 import humanize
-from googleapiclient import discovery
-from litellm import completion
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
-from pydrive2.files import GoogleDriveFile
-from youtube_transcript_api import YouTubeTranscriptApi, FetchedTranscriptSnippet
-from youtube_transcript_api.formatters import _TextBasedFormatter
+
+# Google API clients, LiteLLM and the transcript API take seconds to import,
+# so they are imported where they are first used.
+if TYPE_CHECKING:
+    from pydrive2.auth import GoogleAuth
+    from pydrive2.drive import GoogleDrive
+    from pydrive2.files import GoogleDriveFile
+    from youtube_transcript_api import FetchedTranscriptSnippet
 
 
 VERSION = "1.3"
@@ -24,28 +42,408 @@ VERSION = "1.3"
 ROOT_FOLDER = "gdrive-cast"
 FOLDER_TYPE = "application/vnd.google-apps.folder"
 MEDIA_CACHE_FOLDER = "media-cache"
+MEDIA_PARTIAL_FOLDER = "media-cache/partial"
 FEED_CACHE_FOLDER = "feed-cache"
 FEED_FILE_NAME = "feed.xml"
+MANIFEST_FILE_NAME = "manifest.json"
+FEED_TAIL_SCAN_SIZE = 64 * 1024
+FEED_ARCHIVE_PREFIX = "feed-archive-"
+FEED_ARCHIVE_PATTERN = re.compile(rf"{FEED_ARCHIVE_PREFIX}(\d+)\.xml")
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+HISTORY_NAMESPACE = "http://purl.org/syndication/history/1.0"
+ITUNES_NAMESPACE = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+ITEM_WRAPPER_START = f'<items xmlns:itunes="{ITUNES_NAMESPACE}">'.encode()
+ITEM_WRAPPER_END = b'</items>'
+PARENTS_QUERY_BATCH_SIZE = 40
+INDEX_FILE = "drive-index.db"
+JOBS_FILE = "jobs.db"
+JOB_STAGES = ["queued", "downloaded", "uploaded", "feed_updated"]
+TRANSCRIPT_CACHE_FOLDER = "transcript-cache"
+CHAPTERS_CACHE_FOLDER = "chapters-cache"
+CHANNEL_CACHE_FOLDER = "channel-cache"
+LIBRARY_CACHE_FILE = "library-cache.json"
+YOUTUBE_MAX_IDS_PER_CALL = 50
+CHAPTERS_PROMPT_FILE = "chapters_prompt.txt"
+TRANSCRIPT_LANGUAGES = ["ru", "en"]
+# sound annotations and hesitation words that carry no meaning for chapter titles
+FILLER_PATTERN = re.compile(
+    r"\[[^\]]*\]|\((?:music|applause|laughter|музыка|аплодисменты|смех)\)"
+    r"|\b(?:u+h+|u+m+|e+r+m+|h+m+|mm+|э+м*|а+м+|м+)\b[,.]?",
+    re.IGNORECASE)
+# "1. 00:12:34 – Title", also with markdown list / emphasis markers, without the number or with MM:SS
+CHAPTER_LINE_PATTERN = re.compile(
+    r"^[\s*_#>-]*(?:\d+[.)]\s*)?[*_]*\(?((?:\d{1,2}:)?\d{1,2}:\d{2})\)?[*_]*\s*[–—:-]\s*(.+?)[\s*_]*$")
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v2/files"
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+@functools.cache
+def transcript_formatter_class():
+    from youtube_transcript_api.formatters import _TextBasedFormatter
+
+    class MyFormatter(_TextBasedFormatter):
+        def _format_timestamp(self, hours: int, mins: int, secs: int, ms: int) -> str:
+            return "{:02d}:{:02d}:{:02d}".format(hours, mins, secs)
+
+        def _format_transcript_header(self, lines: Iterable[str]) -> str:
+            return "\n\n".join(lines) + "\n"
+
+        def _format_transcript_helper(
+                self, i: int, time_text: str, snippet: FetchedTranscriptSnippet
+        ) -> str:
+            return "{}\n{}".format(time_text, snippet.text)
+
+    return MyFormatter
+
+
+def lazy_property(method):
+    # Like functools.cached_property, but computed only once even if first used by several threads.
+    # The owner must have a "_lazy_lock" RLock (re-entrant, since lazy properties use each other).
+    attr = f"_lazy_{method.__name__}"
+
+    @functools.wraps(method)
+    def getter(self):
+        try:
+            return self.__dict__[attr]
+        except KeyError:
+            pass
+        with self._lazy_lock:
+            if attr not in self.__dict__:
+                self.__dict__[attr] = method(self)
+            return self.__dict__[attr]
+
+    def setter(self, value):
+        # lets callers provide their own instance, e.g. an offline fake
+        self.__dict__[attr] = value
+
+    return property(getter, setter)
+
+
+class TraceSpan:
+
+    def __init__(self, name: str, parent: TraceSpan | None, attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.drive_requests = 0
+        self.youtube_requests = 0
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Tracer:
+    # Timed spans of PodcastManager operations, with the Drive / YouTube requests and bytes
+    # transferred while they were open. Spans nest per thread; requests are counted on the
+    # innermost open span of the calling thread. Spans are only kept when enabled.
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list[TraceSpan]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        stack = self._stack()
+        span = TraceSpan(name, stack[-1] if stack else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span.end = time.perf_counter()
+            if self.enabled:
+                with self._lock:
+                    self.spans.append(span)
+
+    def count(self, service: str, sent: int = 0, received: int = 0):
+        # one request to "drive" or "youtube"
+        stack = self._stack()
+        if not stack:
+            return
+        span = stack[-1]
+        if service == "drive":
+            span.drive_requests += 1
+        else:
+            span.youtube_requests += 1
+        span.bytes_sent += sent
+        span.bytes_received += received
+
+    def transferred(self, sent: int = 0, received: int = 0):
+        # bytes of a request that was already counted
+        stack = self._stack()
+        if stack:
+            stack[-1].bytes_sent += sent
+            stack[-1].bytes_received += received
+
+    def write(self, file_path: str):
+        # Chrome trace event format, viewable in chrome://tracing or ui.perfetto.dev
+        events = []
+        for thread_id, thread_name in {span.thread_id: span.thread_name for span in self.spans}.items():
+            events.append({'name': "thread_name", 'ph': "M", 'pid': os.getpid(), 'tid': thread_id,
+                           'args': {'name': thread_name}})
+        for span in self.spans:
+            events.append({
+                'name': span.name,
+                'cat': "gdrive-cast",
+                'ph': "X",
+                'ts': round((span.start - self._origin) * 1e6),
+                'dur': round(span.duration * 1e6),
+                'pid': os.getpid(),
+                'tid': span.thread_id,
+                'args': {
+                    **span.attributes,
+                    'parent': span.parent.name if span.parent else None,
+                    'bytes_sent': span.bytes_sent,
+                    'bytes_received': span.bytes_received,
+                    'drive_requests': span.drive_requests,
+                    'youtube_requests': span.youtube_requests,
+                },
+            })
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': "ms"}, f, ensure_ascii=False, default=str)
+
+    def print_summary(self):
+        # per span name; seconds include nested spans, requests and bytes do not
+        rows = {}
+        for span in self.spans:
+            row = rows.setdefault(span.name, [0, 0.0, 0.0, 0, 0, 0, 0])
+            row[0] += 1
+            row[1] += span.duration
+            row[2] = max(row[2], span.duration)
+            row[3] += span.drive_requests
+            row[4] += span.youtube_requests
+            row[5] += span.bytes_sent
+            row[6] += span.bytes_received
+        print(f"{'span':<20} {'count':>6} {'total s':>9} {'max s':>8} {'drive':>6} {'youtube':>8} {'sent':>10} {'received':>10}")
+        for name, (count, total, longest, drive, youtube, sent, received) in sorted(
+                rows.items(), key=lambda row: row[1][1], reverse=True):
+            print(f"{name:<20} {count:>6} {total:>9.3f} {longest:>8.3f} {drive:>6} {youtube:>8} "
+                  f"{humanize.naturalsize(sent, binary=True):>10} {humanize.naturalsize(received, binary=True):>10}")
+
+
+tracer = Tracer()
+
+
+def backoff_delay(attempt: int, cap: float = 60) -> float:
+    # exponential backoff with full jitter, so concurrent workers do not retry in lockstep
+    return random.uniform(0, min(cap, 2 ** attempt))
+
+
+class TokenBucket:
+    # Allows "rate" requests per second on average, with bursts of up to "burst" requests.
+    # A rate of 0 disables the limit.
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class ApiGateway:
+    # The single path for Drive and YouTube Data API requests: a token bucket per API, retries with
+    # backoff_delay on rate limit and server errors, and YouTube quota units counted per quota day
+    # (quotas reset at midnight Pacific time). The daily count is kept in the index, so it covers
+    # every run of the day, and requests fail fast with QuotaExceededError once the limit is reached.
+
+    def __init__(self, config: configparser.ConfigParser, index: DriveIndex):
+        self.buckets = {
+            'drive': TokenBucket(config.getfloat('app', 'drive_requests_per_second', fallback=10),
+                                 config.getfloat('app', 'drive_requests_burst', fallback=20)),
+            'youtube': TokenBucket(config.getfloat('app', 'youtube_requests_per_second', fallback=5),
+                                   config.getfloat('app', 'youtube_requests_burst', fallback=10)),
+        }
+        self.max_retries = config.getint('app', 'api_max_retries', fallback=5)
+        self.youtube_daily_quota = config.getint('app', 'youtube_daily_quota', fallback=10000)
+        self.index = index
+        # quota units used by this process
+        self.quota_used = 0
+        self._quota_exhausted_day = None
+        self._quota_lock = threading.Lock()
+        # the YouTube client (one discovery.build service on one httplib2 connection) is not thread-safe,
+        # so its requests are sent one at a time
+        self._youtube_lock = threading.Lock()
+
+    def execute(self, service: str, request, sent: int = 0, cost: int = 1, max_retries: int | None = None,
+                already_done=None):
+        # Request is called once per attempt, so it must build the API call itself.
+        # A request that is not idempotent (a create) passes already_done: it is called before each retry
+        # and returns the result if the failed attempt took effect on the server after all, else None.
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            if service == "youtube":
+                self._charge_quota(cost)
+            self.buckets[service].acquire()
+            tracer.count(service, sent=sent)
+            try:
+                if service == "youtube":
+                    with self._youtube_lock:
+                        return request()
+                return request()
+            except Exception as e:
+                status, reasons = self._error_status(e)
+                if service == "youtube" and status == 403 and 'quotaExceeded' in reasons:
+                    self._quota_exhausted_day = self.quota_day()
+                    raise QuotaExceededError("YouTube Data API daily quota exceeded") from e
+                if attempt == max_retries or not self._retryable(e, status, reasons):
+                    raise
+                delay = backoff_delay(attempt, cap=32)
+                print(f"{service} request failed ({status or type(e).__name__}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                if already_done is not None:
+                    result = already_done()
+                    if result is not None:
+                        return result
+
+    @staticmethod
+    def quota_day() -> str:
+        # Pacific standard time, close enough to the quota reset
+        return datetime.now(timezone(timedelta(hours=-8))).date().isoformat()
+
+    def _charge_quota(self, cost: int):
+        day = self.quota_day()
+        with self._quota_lock:
+            used = self.index.get_youtube_quota(day)
+            if self._quota_exhausted_day == day or used + cost > self.youtube_daily_quota:
+                raise QuotaExceededError(f"YouTube quota used up for {day}: {used} of {self.youtube_daily_quota} units")
+            self.index.add_youtube_quota(day, cost)
+            self.quota_used += cost
+
+    def quota_report(self) -> str:
+        day = self.quota_day()
+        return (f"YouTube quota: {self.quota_used} unit(s) used by this run, "
+                f"{self.index.get_youtube_quota(day)} of {self.youtube_daily_quota} on {day}")
+
+    @staticmethod
+    def _error_status(e: Exception) -> tuple[int | None, set[str]]:
+        # HTTP status and error reasons of a googleapiclient HttpError or PyDrive2 ApiRequestError
+        from googleapiclient.errors import HttpError
+        from pydrive2.files import ApiRequestError
+        if isinstance(e, ApiRequestError) and e.args and isinstance(e.args[0], HttpError):
+            e = e.args[0]
+        if not isinstance(e, HttpError):
+            return None, set()
+        try:
+            errors = json.loads(e.content).get('error', {}).get('errors', [])
+        except (ValueError, AttributeError):
+            errors = []
+        return e.resp.status, {error.get('reason') for error in errors}
+
+    @staticmethod
+    def _retryable(e: Exception, status: int | None, reasons: set[str]) -> bool:
+        if status is None:
+            # connection errors
+            return isinstance(e, (httplib2.HttpLib2Error, OSError))
+        return status in RETRYABLE_STATUS_CODES \
+            or status == 403 and bool(reasons & {'rateLimitExceeded', 'userRateLimitExceeded'})
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return "{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def compact_transcript(snippets: list[FetchedTranscriptSnippet], window_seconds: int) -> list[tuple[float, str]]:
+    # merges caption snippets into (start, text) windows of about window_seconds and strips filler
+    windows = []
+    window_start, parts = None, []
+    for snippet in snippets:
+        text = " ".join(FILLER_PATTERN.sub(" ", snippet.text).split())
+        if not text:
+            continue
+        if window_start is None:
+            window_start = snippet.start
+        elif snippet.start - window_start >= window_seconds:
+            windows.append((window_start, " ".join(parts)))
+            window_start, parts = snippet.start, []
+        parts.append(text)
+    if parts:
+        windows.append((window_start, " ".join(parts)))
+    return windows
+
+
+def format_windows(windows: list[tuple[float, str]]) -> str:
+    # same layout as the transcript formatter: a timestamp line followed by the text
+    return "\n\n".join(f"{format_timestamp(start)}\n{text}" for start, text in windows) + "\n"
+
+
+def split_windows(windows: list[tuple[float, str]], max_chars: int) -> list[list[tuple[float, str]]]:
+    chunks, chunk, size = [], [], 0
+    for window in windows:
+        if chunk and size + len(window[1]) > max_chars:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(window)
+        size += len(window[1])
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def merge_chapter_lists(chapter_lists: list[str]) -> str:
+    # Combines the numbered chapter lists of consecutive transcript parts into one list.
+    # If no line has the expected shape, the part outputs are joined as they are.
+    chapters = []
+    for chapter_list in chapter_lists:
+        for line in chapter_list.splitlines():
+            match = CHAPTER_LINE_PATTERN.match(line)
+            if match:
+                timestamp, title = match.groups()
+                time_parts = tuple(int(x) for x in timestamp.split(":"))
+                chapters.append(((0,) * (3 - len(time_parts)) + time_parts, title))
+    if not chapters:
+        return "\n".join(chapter_list.strip() for chapter_list in chapter_lists if chapter_list.strip())
+
+    merged = []
+    for time_parts, title in sorted(chapters):
+        # parts often end and start with the same topic
+        if merged and merged[-1][1].casefold() == title.casefold():
+            continue
+        merged.append((time_parts, title))
+
+    return "\n".join(f"{n}. {h:02d}:{m:02d}:{s:02d} – {title}" for n, ((h, m, s), title) in enumerate(merged, start=1))
 
-class MyFormatter(_TextBasedFormatter):
-    def _format_timestamp(self, hours: int, mins: int, secs: int, ms: int) -> str:
-        return "{:02d}:{:02d}:{:02d}".format(hours, mins, secs)
-
-    def _format_transcript_header(self, lines: Iterable[str]) -> str:
-        return "\n\n".join(lines) + "\n"
-
-    def _format_transcript_helper(
-            self, i: int, time_text: str, snippet: FetchedTranscriptSnippet
-    ) -> str:
-        return "{}\n{}".format(time_text, snippet.text)
 
 class YouTubeVideo:
 
-    def __init__(self, youtube, video_id):
-        response = youtube.videos().list(part='snippet,contentDetails', id=video_id).execute()
-        snippet = response['items'][0]['snippet']
+    def __init__(self, item: dict):
+        # item is a resource returned by videos().list(part='snippet,contentDetails')
+        snippet = item['snippet']
 
-        self.id = video_id
+        self.id = item['id']
         self.title = snippet['title']
         self.description = snippet['description']
         self.published = snippet['publishedAt']
@@ -56,9 +454,9 @@ class YouTubeVideo:
 
 class YouTubeChannel:
 
-    def __init__(self, youtube, channel_id):
-        response = youtube.channels().list(part='snippet,brandingSettings', id=channel_id).execute()
-        item = response['items'][0]
+    def __init__(self, item: dict):
+        # item is a resource returned by channels().list(part='snippet,brandingSettings')
+        channel_id = item['id']
         snippet = item.get('snippet', {})
 
         self.title = snippet.get('title', 'N/A')
@@ -69,6 +467,82 @@ class YouTubeChannel:
         self.banner_url = branding.get('bannerExternalUrl', 'No banner image found.')
 
 
+class YouTubeMetadata:
+    # Resolves videos and channels with as few Data API calls as possible: list calls take up to
+    # 50 IDs each and cost the same quota as a call for a single ID. Channel resources rarely
+    # change, so they are also cached on disk for a configurable time.
+
+    def __init__(self, youtube, api: ApiGateway, channel_cache: FileCache, channel_ttl_seconds: int):
+        self.youtube = youtube
+        self.api = api
+        self.channel_cache = channel_cache
+        self.channel_ttl_seconds = channel_ttl_seconds
+
+    def get_videos(self, video_ids: list[str]) -> dict[str, YouTubeVideo]:
+        items = self._list(self.youtube.videos(), 'snippet,contentDetails', video_ids)
+        return {item['id']: YouTubeVideo(item) for item in items}
+
+    def get_channels(self, channel_ids: list[str], bypass_cache: bool = False) -> dict[str, YouTubeChannel]:
+        channels = {}
+        missing = []
+        for channel_id in dict.fromkeys(channel_ids):
+            cached = None if bypass_cache else self.channel_cache.get(f"{channel_id}.json")
+            if cached is not None:
+                entry = json.loads(cached)
+                if time.time() - entry['fetched'] < self.channel_ttl_seconds:
+                    channels[channel_id] = YouTubeChannel(entry['item'])
+                    continue
+            missing.append(channel_id)
+
+        now = time.time()
+        for item in self._list(self.youtube.channels(), 'snippet,brandingSettings', missing):
+            self.channel_cache.put(f"{item['id']}.json", json.dumps({'fetched': now, 'item': item}, ensure_ascii=False))
+            channels[item['id']] = YouTubeChannel(item)
+        return channels
+
+    def _list(self, resource, part: str, ids: list[str]) -> list[dict]:
+        ids = list(dict.fromkeys(ids))
+        items = []
+        for i in range(0, len(ids), YOUTUBE_MAX_IDS_PER_CALL):
+            chunk = ids[i:i + YOUTUBE_MAX_IDS_PER_CALL]
+            response = self.api.execute("youtube", lambda: resource.list(part=part, id=",".join(chunk)).execute())
+            items.extend(response.get('items', []))
+        return items
+
+
+class PodcastEpisode:
+
+    def __init__(self, video: YouTubeVideo, channel: YouTubeChannel):
+        self.video = video
+        self.channel = channel
+        self.audio_file_path = None
+        self.audio_file_size = None
+        # set when the audio was uploaded by an earlier run, and neither conversion nor upload is needed
+        self.remote_audio_file = None
+
+
+class BatchItem:
+
+    def __init__(self, source: str, video_id: str | None = None, error: str | None = None):
+        self.source = source
+        self.video_id = video_id
+        self.title = None
+        self.stage = "resolved"
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.stage == "done"
+
+    def fail(self, e: BaseException):
+        self.error = f"{type(e).__name__}: {e}"
+
+
+def parse_published(published: str) -> datetime:
+    # YouTube timestamps look like 2025-01-01T10:00:00Z
+    return datetime.fromisoformat(published.replace("Z", "+00:00"))
+
+
 def extract_video_id(video_url):
     # parse YouTube URL and extract video ID
     # https://www.youtube.com/watch?v=XYZ -> XYZ
@@ -88,6 +562,768 @@ def extract_video_id(video_url):
     return video_id
 
 
+def extract_playlist_id(url) -> str | None:
+    # https://www.youtube.com/playlist?list=XYZ -> XYZ
+    # a "watch" URL that also carries a playlist is treated as a single video
+    parsed_url = urlparse(url)
+    if "youtube" not in parsed_url.netloc:
+        return None
+
+    query_params = parse_qs(parsed_url.query)
+    if "v" in query_params or "list" not in query_params:
+        return None
+
+    return query_params['list'][0]
+
+
+def read_url_file(file_path) -> list[str]:
+    # one URL per line, blank lines and lines starting with '#' are ignored
+    with open(file_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def print_batch_summary(items: list[BatchItem]):
+    succeeded = [i for i in items if i.ok]
+    failed = [i for i in items if not i.ok]
+
+    print("\n--- Batch Summary ---")
+    for item in items:
+        label = item.title or item.video_id or item.source
+        if item.ok:
+            print(f" [OK]     {label}")
+        else:
+            print(f" [FAILED] {label} (stage: {item.stage}): {item.error}")
+    print(f"Succeeded: {len(succeeded)}, failed: {len(failed)}, total: {len(items)}")
+
+
+class FileCache:
+    # Directory of cache entries with a total size cap. Reading an entry refreshes its
+    # modification time, so the least recently used entries are evicted first.
+    # Pinned entries are in use (e.g. waiting to be uploaded) and are never evicted.
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pinned = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def get(self, name: str) -> str | None:
+        path = self.path(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return text
+
+    def put(self, name: str, text: str):
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def touch(self, name: str) -> bool:
+        # marks an existing entry as recently used; returns False if there is no such entry
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def pin(self, name: str):
+        with self._lock:
+            self._pinned[name] = self._pinned.get(name, 0) + 1
+
+    def unpin(self, name: str):
+        with self._lock:
+            self._pinned[name] -= 1
+            if not self._pinned[name]:
+                del self._pinned[name]
+
+    @contextmanager
+    def pinned(self, *names: str):
+        for name in names:
+            self.pin(name)
+        try:
+            yield
+        finally:
+            for name in names:
+                self.unpin(name)
+
+    def evict(self):
+        if not os.path.isdir(self.folder):
+            return
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if name in self._pinned:
+                    continue
+                try:
+                    os.remove(self.path(name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class DriveIndex:
+    # Local cache of Drive file metadata keyed by (parent folder ID, title).
+    # A folder is "listed" when all of its children are known to be in the index,
+    # so a missing entry there means the file does not exist on Drive.
+
+    def __init__(self, path: str = INDEX_FILE):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                parent_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                id TEXT NOT NULL,
+                mime_type TEXT,
+                md5 TEXT,
+                size INTEGER,
+                position INTEGER,
+                PRIMARY KEY (parent_id, title)
+            );
+            CREATE INDEX IF NOT EXISTS files_id ON files (id);
+            CREATE TABLE IF NOT EXISTS listed_folders (id TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                channel_id TEXT PRIMARY KEY,
+                etag TEXT,
+                last_video_id TEXT,
+                last_published TEXT
+            );
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                parent_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                uri TEXT NOT NULL,
+                PRIMARY KEY (parent_id, title)
+            );
+            CREATE TABLE IF NOT EXISTS youtube_quota (day TEXT PRIMARY KEY, units INTEGER NOT NULL);
+        """)
+        # indexes written before sync_state had last_published
+        if 'last_published' not in {row[1] for row in self._db.execute("PRAGMA table_info(sync_state)")}:
+            self._db.execute("ALTER TABLE sync_state ADD COLUMN last_published TEXT")
+        self._db.commit()
+
+    def get(self, parent_id: str, title: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT parent_id, title, id, mime_type, md5, size FROM files WHERE parent_id=? AND title=?",
+                (parent_id, title)).fetchone()
+        return self._entry(row) if row else None
+
+    def children(self, parent_id: str, mime_type: str | None = None) -> list[dict]:
+        query = "SELECT parent_id, title, id, mime_type, md5, size FROM files WHERE parent_id=?"
+        params = [parent_id]
+        if mime_type:
+            query += " AND mime_type=?"
+            params.append(mime_type)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY position, title", params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def is_listed(self, folder_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM listed_folders WHERE id=?", (folder_id,)).fetchone() is not None
+
+    def put(self, parent_id: str, remote_file: GoogleDriveFile):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (parent_id, title, id, mime_type, md5, size, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM files WHERE parent_id=?))",
+                (parent_id, remote_file['title'], remote_file['id'], remote_file.get('mimeType'),
+                 remote_file.get('md5Checksum'), remote_file.get('fileSize'), parent_id))
+
+    def replace_children(self, parent_id: str, remote_files: list[GoogleDriveFile], mime_type: str | None = None):
+        # store a complete listing of a folder (or of its children of one type), keeping the listing order
+        with self._lock, self._db:
+            if mime_type:
+                self._db.execute("DELETE FROM files WHERE parent_id=? AND mime_type=?", (parent_id, mime_type))
+            else:
+                self._db.execute("DELETE FROM files WHERE parent_id=?", (parent_id,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (parent_id, title, id, mime_type, md5, size, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(parent_id, f['title'], f['id'], f.get('mimeType'), f.get('md5Checksum'), f.get('fileSize'), position)
+                 for position, f in enumerate(remote_files)])
+            self._db.execute("INSERT OR IGNORE INTO listed_folders (id) VALUES (?)", (parent_id,))
+
+    def remove(self, file_id: str):
+        # removes the file and, for a folder, everything indexed below it
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files WHERE id=? OR parent_id=?", (file_id, file_id))
+            self._db.execute("DELETE FROM listed_folders WHERE id=?", (file_id,))
+
+    def get_sync_state(self, channel_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_video_id, last_published FROM sync_state WHERE channel_id=?",
+                                   (channel_id,)).fetchone()
+        return {'etag': row[0], 'last_video_id': row[1], 'last_published': row[2]} if row else None
+
+    def put_sync_state(self, channel_id: str, etag: str | None, last_video_id: str | None, last_published: str | None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (channel_id, etag, last_video_id, last_published) VALUES (?, ?, ?, ?)",
+                (channel_id, etag, last_video_id, last_published))
+
+    def get_youtube_quota(self, day: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT units FROM youtube_quota WHERE day=?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def add_youtube_quota(self, day: str, units: int):
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO youtube_quota (day, units) VALUES (?, ?) "
+                             "ON CONFLICT (day) DO UPDATE SET units = units + excluded.units", (day, units))
+
+    def get_upload_session(self, parent_id: str, title: str, file_path: str) -> str | None:
+        # a session is only valid for the exact same local file
+        stat = os.stat(file_path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uri FROM upload_sessions WHERE parent_id=? AND title=? AND file_path=? AND size=? AND mtime=?",
+                (parent_id, title, file_path, stat.st_size, stat.st_mtime)).fetchone()
+        return row[0] if row else None
+
+    def put_upload_session(self, parent_id: str, title: str, file_path: str, uri: str):
+        stat = os.stat(file_path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO upload_sessions (parent_id, title, file_path, size, mtime, uri) VALUES (?, ?, ?, ?, ?, ?)",
+                (parent_id, title, file_path, stat.st_size, stat.st_mtime, uri))
+
+    def remove_upload_session(self, parent_id: str, title: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM upload_sessions WHERE parent_id=? AND title=?", (parent_id, title))
+
+    @staticmethod
+    def _entry(row) -> dict:
+        return dict(zip(('parent_id', 'title', 'id', 'mime_type', 'md5', 'size'), row))
+
+
+class JobQueue:
+    # Persistent queue of episode downloads, shared by the CLI, the GUI and the worker (--worker).
+    # A job goes through the stages queued -> downloaded -> uploaded -> feed_updated, and each
+    # stage is saved when it completes, so a job interrupted by a crash continues from there.
+
+    COLUMNS = ('id', 'video_id', 'source', 'add_timestamps', 'status', 'stage', 'attempts', 'error',
+               'title', 'audio_link', 'audio_file_size', 'feed_link', 'created', 'updated')
+
+    def __init__(self, path: str = JOBS_FILE):
+        self._lock = threading.Lock()
+        # the CLI, the GUI and the worker may use the queue at the same time
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT NOT NULL,
+                source TEXT,
+                add_timestamps INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                stage TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                title TEXT,
+                audio_link TEXT,
+                audio_file_size INTEGER,
+                feed_link TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+        """)
+        self._db.commit()
+
+    def add(self, video_id: str, source: str, add_timestamps: bool) -> tuple[int, bool]:
+        # returns (job ID, False if the video already has a pending or running job)
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id FROM jobs WHERE video_id=? AND status IN ('pending', 'running')",
+                                   (video_id,)).fetchone()
+            if row:
+                return row[0], False
+            cursor = self._db.execute(
+                "INSERT INTO jobs (video_id, source, add_timestamps, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (video_id, source, int(add_timestamps), now, now))
+            return cursor.lastrowid, True
+
+    def claim(self) -> dict | None:
+        # marks the oldest pending job as running and returns it
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status='pending' ORDER BY id LIMIT 1").fetchone()
+            if not row:
+                return None
+            self._db.execute("UPDATE jobs SET status='running', attempts=attempts + 1, updated=? WHERE id=?",
+                             (time.time(), row[0]))
+        job = dict(zip(self.COLUMNS, row))
+        job['attempts'] += 1
+        return job
+
+    def checkpoint(self, job_id: int, stage: str, **fields):
+        # records a completed stage, with what the following stages need from it
+        fields['stage'] = stage
+        if stage == JOB_STAGES[-1]:
+            fields['status'] = 'done'
+            fields['error'] = None
+        self._update(job_id, fields)
+
+    def fail(self, job_id: int, error: str, retry: bool):
+        self._update(job_id, {'status': 'pending' if retry else 'failed', 'error': error})
+
+    def requeue_running(self) -> int:
+        # jobs left running by a worker that stopped; they continue from their last stage
+        with self._lock, self._db:
+            return self._db.execute("UPDATE jobs SET status='pending', updated=? WHERE status='running'",
+                                    (time.time(),)).rowcount
+
+    def list(self, limit: int = 50) -> list[dict]:
+        # the most recent jobs, newest first
+        with self._lock:
+            rows = self._db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?",
+                                    (limit,)).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def _update(self, job_id: int, fields: dict):
+        fields['updated'] = time.time()
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {', '.join(f'{name}=?' for name in fields)} WHERE id=?",
+                             (*fields.values(), job_id))
+
+
+def print_job_status(jobs: list[dict]):
+    print(f"{'id':>5} {'status':<8} {'stage':<13} {'tries':>5}  video")
+    for job in jobs:
+        print(f"{job['id']:>5} {job['status']:<8} {job['stage']:<13} {job['attempts']:>5}  "
+              f"{job['title'] or job['video_id']}")
+        if job['error'] and job['status'] != 'done':
+            print(f"{'':>34}{job['error']}")
+
+
+class UploadError(Exception):
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        # HTTP status of the failed request, if there was a response
+        self.status = status
+
+
+class TransientUploadError(UploadError):
+    pass
+
+
+class ResumableUpload:
+    # Drive v2 resumable upload session (https://developers.google.com/drive/api/guides/manage-uploads#resumable).
+    # The file is sent in chunks; after a transient error the upload continues from the last
+    # offset acknowledged by the server. An existing session URI can be passed in to continue
+    # an upload started by another process. Without a file path the content is read from a
+    # stream of unknown length (see run_stream).
+
+    def __init__(self, http, file_path: str | None, metadata: dict, file_id: str | None = None,
+                 chunk_size: int = 8 * 1024 * 1024, max_retries: int = 5,
+                 session_uri: str | None = None, on_session=None, progress=None, upload_url: str = DRIVE_UPLOAD_URL,
+                 rate_limiter: TokenBucket | None = None):
+        self.http = http
+        self.rate_limiter = rate_limiter
+        self.file_path = file_path
+        self.metadata = metadata
+        self.file_id = file_id
+        self.chunk_size = max(UPLOAD_CHUNK_ALIGNMENT, chunk_size // UPLOAD_CHUNK_ALIGNMENT * UPLOAD_CHUNK_ALIGNMENT)
+        self.max_retries = max_retries
+        self.session_uri = session_uri
+        self.on_session = on_session
+        self.progress = progress
+        self.upload_url = upload_url
+        self.total_size = os.path.getsize(file_path) if file_path else None
+        self.mime_type = metadata.get('mimeType') or mimetypes.guess_type(file_path or metadata.get('title', ''))[0] \
+            or 'application/octet-stream'
+
+    def start(self) -> str:
+        if self.file_id:
+            uri, method = f"{self.upload_url}/{self.file_id}?uploadType=resumable", "PUT"
+        else:
+            uri, method = f"{self.upload_url}?uploadType=resumable", "POST"
+        headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'X-Upload-Content-Type': self.mime_type,
+        }
+        if self.total_size is not None:
+            headers['X-Upload-Content-Length'] = str(self.total_size)
+        resp, content = self._request(uri, method, body=json.dumps(self.metadata), headers=headers)
+        if resp.status in RETRYABLE_STATUS_CODES:
+            raise TransientUploadError(f"Failed to start upload session: HTTP {resp.status}", resp.status)
+        if resp.status != 200 or 'location' not in resp:
+            raise UploadError(f"Failed to start upload session: HTTP {resp.status} {content[:200]!r}", resp.status)
+        self.session_uri = resp['location']
+        if self.on_session:
+            self.on_session(self.session_uri)
+        return self.session_uri
+
+    def _start_with_retry(self) -> str:
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                return self.start()
+            except (OSError, httplib2.HttpLib2Error, TransientUploadError) as e:
+                if attempt > self.max_retries:
+                    raise UploadError(f"Upload failed after {self.max_retries} retries: {e}") from e
+                delay = backoff_delay(attempt)
+                print(f"Upload not started ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def query_offset(self) -> tuple[int, dict | None]:
+        # asks the server how many bytes it has; returns (offset, file resource if already complete)
+        resp, content = self._request(self.session_uri, "PUT", body=b"", headers={
+            'Content-Length': '0',
+            'Content-Range': f"bytes */{self._total()}",
+        })
+        return self._handle_response(resp, content)
+
+    def run(self) -> dict:
+        offset = 0
+        if self.session_uri:
+            try:
+                offset, result = self.query_offset()
+                if result is not None:
+                    return result
+                print(f"Resuming upload at {humanize.naturalsize(offset, binary=True)}")
+            except UploadError:
+                # expired or unknown session: start over
+                self.session_uri = None
+        if not self.session_uri:
+            self._start_with_retry()
+
+        started = time.monotonic()
+        retries = 0
+        with open(self.file_path, "rb") as f:
+            while True:
+                try:
+                    f.seek(offset)
+                    chunk = f.read(self.chunk_size)
+                    end = offset + len(chunk) - 1
+                    resp, content = self._request(self.session_uri, "PUT", body=chunk, headers={
+                        'Content-Length': str(len(chunk)),
+                        'Content-Range': f"bytes {offset}-{end}/{self.total_size}" if chunk else f"bytes */{self.total_size}",
+                    })
+                    offset, result = self._handle_response(resp, content)
+                except (OSError, httplib2.HttpLib2Error, TransientUploadError) as e:
+                    retries += 1
+                    if retries > self.max_retries:
+                        raise UploadError(f"Upload failed after {self.max_retries} retries: {e}") from e
+                    delay = backoff_delay(retries)
+                    print(f"Upload interrupted ({e}), retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    offset, result = self._query_offset_after_error(offset)
+                    if result is not None:
+                        return result
+                    continue
+
+                retries = 0
+                if self.progress:
+                    self.progress(offset, self.total_size, time.monotonic() - started)
+                if result is not None:
+                    return result
+
+    def run_stream(self, stream) -> dict:
+        # The total size is unknown until the stream ends, so every chunk but the last one is sent
+        # with "bytes a-b/*". Only the chunk that is not acknowledged yet is kept in memory.
+        self._start_with_retry()
+
+        started = time.monotonic()
+        retries = 0
+        offset = 0
+        buffer = bytearray()
+        eof = False
+        while True:
+            while not eof and len(buffer) < self.chunk_size:
+                data = stream.read(self.chunk_size - len(buffer))
+                if not data:
+                    eof = True
+                buffer += data
+            if eof:
+                self.total_size = offset + len(buffer)
+
+            try:
+                end = offset + len(buffer) - 1
+                resp, content = self._request(self.session_uri, "PUT", body=bytes(buffer), headers={
+                    'Content-Length': str(len(buffer)),
+                    'Content-Range': f"bytes {offset}-{end}/{self._total()}" if buffer else f"bytes */{self._total()}",
+                })
+                acknowledged, result = self._handle_response(resp, content)
+            except (OSError, httplib2.HttpLib2Error, TransientUploadError) as e:
+                retries += 1
+                if retries > self.max_retries:
+                    raise UploadError(f"Upload failed after {self.max_retries} retries: {e}") from e
+                delay = backoff_delay(retries)
+                print(f"Upload interrupted ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                acknowledged, result = self._query_offset_after_error(offset)
+                if result is not None:
+                    return result
+                del buffer[:acknowledged - offset]
+                offset = acknowledged
+                continue
+
+            retries = 0
+            if result is not None:
+                if self.progress:
+                    self.progress(self.total_size, self.total_size, time.monotonic() - started)
+                return result
+            if acknowledged < offset or acknowledged > offset + len(buffer):
+                raise UploadError(f"Unexpected upload offset: {acknowledged}, expected {offset}..{offset + len(buffer)}")
+            del buffer[:acknowledged - offset]
+            offset = acknowledged
+            if self.progress:
+                self.progress(offset, self.total_size, time.monotonic() - started)
+
+    def _request(self, uri: str, method: str, body, headers: dict):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        tracer.count("drive", sent=len(body))
+        return self.http.request(uri, method, body=body, headers=headers)
+
+    def _total(self) -> str:
+        return "*" if self.total_size is None else str(self.total_size)
+
+    def _query_offset_after_error(self, offset: int) -> tuple[int, dict | None]:
+        try:
+            return self.query_offset()
+        except (OSError, httplib2.HttpLib2Error, TransientUploadError):
+            # status is unknown, try the same chunk again on the next round
+            return offset, None
+
+    def _handle_response(self, resp, content) -> tuple[int, dict | None]:
+        if resp.status in (200, 201):
+            return self.total_size or 0, json.loads(content)
+        if resp.status == 308:
+            # "Range: bytes=0-N" is the last acknowledged byte; no header means nothing was received
+            received = resp.get('range')
+            return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+        if resp.status in RETRYABLE_STATUS_CODES:
+            raise TransientUploadError(f"HTTP {resp.status}", resp.status)
+        raise UploadError(f"Upload failed: HTTP {resp.status} {content[:200]!r}", resp.status)
+
+
+def print_upload_progress(sent: int, total: int | None, elapsed: float):
+    rate = humanize.naturalsize(sent / elapsed if elapsed > 0 else 0, binary=True)
+    if total is None:
+        # streaming upload, the size is not known yet
+        print(f"Uploaded {humanize.naturalsize(sent, binary=True)} ({rate}/s)")
+        return
+    percent = sent * 100 // total if total else 100
+    print(f"Uploaded {humanize.naturalsize(sent, binary=True)} of {humanize.naturalsize(total, binary=True)} "
+          f"({percent}%, {rate}/s)")
+
+
+def build_feed_item(video: YouTubeVideo, description: str, audio_link: str, audio_file_size: int) -> ET.Element:
+    item = ET.Element("item")
+    ET.SubElement(item, "title").text = video.title
+    ET.SubElement(item, "description").text = description
+    ET.SubElement(item, "itunes:explicit").text = 'no'
+    ET.SubElement(item, "enclosure", url=audio_link, length=f'{audio_file_size}', type="audio/mpeg")
+    ET.SubElement(item, "guid").text = audio_link
+    video_date = datetime.fromisoformat(video.published)
+    ET.SubElement(item, "pubDate").text = format_datetime(video_date)
+    return item
+
+
+def append_feed_item(feed_file: str, item: ET.Element) -> bool:
+    # Inserts the item right before the closing </channel> tag, rewriting only the tail of the file,
+    # so the cost does not depend on the size of the feed. The output is formatted the same way as
+    # ET.indent(tree, space="\t") would do it.
+    # Returns False if the file does not end the way this tool writes feeds.
+    size = os.path.getsize(feed_file)
+    with open(feed_file, "r+b") as f:
+        tail_start = max(0, size - FEED_TAIL_SCAN_SIZE)
+        f.seek(tail_start)
+        tail = f.read()
+
+        end = tail.rfind(b"</channel>")
+        if end < 0:
+            return False
+        # insert at the start of the "\t</channel>" line
+        line_start = tail.rfind(b"\n", 0, end) + 1
+        if line_start == 0 or tail[line_start:end].strip():
+            return False
+
+        ET.indent(item, space="\t", level=2)
+        item_xml = b"\t\t" + ET.tostring(item, encoding="utf-8", xml_declaration=False) + b"\n"
+
+        f.seek(tail_start + line_start)
+        f.write(item_xml + tail[line_start:])
+        f.truncate()
+    return True
+
+
+def feed_has_guid(feed_file: str, guid: str) -> bool:
+    # streams the feed; items written by this tool have their <guid> on a single line
+    needle = f"<guid>{escape(guid)}</guid>".encode("utf-8")
+    with open(feed_file, "rb") as f:
+        return any(needle in line for line in f)
+
+
+def remove_feed_items(feed_file: str, keep=None) -> list[str]:
+    # Streams the feed line by line and drops <item> blocks for which keep(item) is false
+    # (all items if keep is None). Items are only parsed one at a time, never the whole feed.
+    # Returns the titles of the removed items.
+    removed = []
+    tmp_file = feed_file + ".tmp"
+    with open(feed_file, "rb") as src, open(tmp_file, "wb") as dst:
+        item_lines = None
+        for line in src:
+            if item_lines is None:
+                if line.strip() == b"<item>":
+                    item_lines = [line]
+                else:
+                    dst.write(line)
+                continue
+
+            item_lines.append(line)
+            if line.strip() == b"</item>":
+                # the item alone does not declare the namespaces it uses
+                item = ET.fromstring(ITEM_WRAPPER_START + b"".join(item_lines) + ITEM_WRAPPER_END)[0]
+                if keep is not None and keep(item):
+                    dst.writelines(item_lines)
+                else:
+                    removed.append(item.findtext('title'))
+                item_lines = None
+    os.replace(tmp_file, feed_file)
+    return removed
+
+
+def count_feed_items(feed_file: str) -> int:
+    # streams the feed; items written by this tool start with <item> on its own line
+    with open(feed_file, "rb") as f:
+        return sum(1 for line in f if line.strip() == b"<item>")
+
+
+def item_published(item: ET.Element) -> datetime:
+    # the item's pubDate; items without a valid one count as the oldest
+    try:
+        published = parsedate_to_datetime(item.findtext('pubDate'))
+    except (TypeError, ValueError):
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+
+
+def archive_file_name(number: int) -> str:
+    return f"{FEED_ARCHIVE_PREFIX}{number:04d}.xml"
+
+
+def archive_number(title: str) -> int | None:
+    # feed-archive-0003.xml -> 3, None for any other file
+    match = FEED_ARCHIVE_PATTERN.fullmatch(title)
+    return int(match.group(1)) if match else None
+
+
+def set_feed_link(channel: ET.Element, rel: str, href: str | None):
+    # sets the channel's <atom:link rel="..."> (removes it if href is None); new links go before the items
+    link = next((e for e in channel.findall(f"{{{ATOM_NAMESPACE}}}link") if e.get('rel') == rel), None)
+    if href is None:
+        if link is not None:
+            channel.remove(link)
+        return
+    if link is None:
+        link = ET.Element(f"{{{ATOM_NAMESPACE}}}link", rel=rel)
+        first_item = channel.find('item')
+        channel.insert(list(channel).index(first_item) if first_item is not None else len(channel), link)
+    link.set('href', href)
+
+
+def write_archive_page(archive_file: str, channel: ET.Element, items: list[ET.Element],
+                       current_link: str | None, prev_link: str | None):
+    # An RFC 5005 archive document: the feed's channel header marked with <fh:archive/>,
+    # a link to the subscription feed, a link to the previous (older) page and the items.
+    rss = ET.Element("rss", version="2.0")
+    page = ET.SubElement(rss, "channel")
+    for element in channel:
+        if element.tag not in ('item', f"{{{ATOM_NAMESPACE}}}link"):
+            page.append(copy.deepcopy(element))
+    ET.SubElement(page, f"{{{HISTORY_NAMESPACE}}}archive")
+    set_feed_link(page, "current", current_link)
+    set_feed_link(page, "prev-archive", prev_link)
+    page.extend(items)
+
+    tree = ET.ElementTree(rss)
+    ET.indent(tree, space="\t", level=0)
+    tree.write(archive_file, encoding="utf-8", xml_declaration=True)
+
+
+def read_feed_episodes(feed_file: str) -> tuple[str | None, list[dict]]:
+    # streams the feed, keeping only the channel title and the title, date and guid of each item
+    title, episodes = None, []
+    for _, element in ET.iterparse(feed_file, events=("end",)):
+        if element.tag == "item":
+            episodes.append({'title': element.findtext('title'), 'date': element.findtext('pubDate'),
+                             'guid': element.findtext('guid')})
+            element.clear()
+        elif element.tag == "title" and title is None:
+            # the channel title comes before any items
+            title = element.text
+    return title, episodes
+
+
+def read_manifest(manifest_file: str) -> dict | None:
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_manifest(manifest_file: str, manifest: dict):
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_file, manifest_file)
+
+
+def read_feed_title(feed_file: str) -> str | None:
+    # stops parsing at the channel title, which comes before any items
+    for _, element in ET.iterparse(feed_file, events=("end",)):
+        if element.tag == "title":
+            return element.text
+    return None
+
+
+def drive_file_id_from_link(link: str) -> str | None:
+    # direct links look like https://drive.usercontent.google.com/download?...&id=FILE_ID
+    ids = parse_qs(urlparse(link or "").query).get('id')
+    return ids[0] if ids else None
+
+
+def direct_link(file_id: str) -> str:
+    return f"https://drive.usercontent.google.com/download?export=download&confirm=t&id={file_id}"
+
+
+def file_md5(file_path: str) -> str:
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def is_same_content(local_file: str, remote_file: GoogleDriveFile) -> bool:
+    remote_md5 = remote_file.get('md5Checksum')
+    return bool(remote_md5) and os.path.exists(local_file) and file_md5(local_file) == remote_md5
+
+
 def process_file(command_template: str, video_id: str) -> str:
     if not command_template:
         print("No external command configured. Skipping.")
@@ -95,28 +1331,126 @@ def process_file(command_template: str, video_id: str) -> str:
 
     output_file = f"{MEDIA_CACHE_FOLDER}/{video_id}.mp3"
 
-    command_to_run = command_template.format(video_id=video_id, output_file=output_file)
+    # the converter writes into a work folder and only a complete file is moved into the cache,
+    # so a file in media-cache is never the leftover of an interrupted conversion
+    partial_file = f"{MEDIA_PARTIAL_FOLDER}/{video_id}.mp3"
+    os.makedirs(MEDIA_PARTIAL_FOLDER, exist_ok=True)
+    for name in os.listdir(MEDIA_PARTIAL_FOLDER):
+        if name.startswith(f"{video_id}."):
+            os.remove(os.path.join(MEDIA_PARTIAL_FOLDER, name))
+
+    command_to_run = command_template.format(video_id=video_id, output_file=partial_file)
     print(f"Executing: {command_to_run}")
     subprocess.run(shlex.split(command_to_run), check=True)
     print("Command executed successfully.")
+    os.replace(partial_file, output_file)
     return output_file
 
 
+class ProcessOutputStream:
+    # Readable stdout of a command or a "cmd1 | cmd2" pipeline. Reaching the end of the output
+    # waits for the processes and raises CalledProcessError if any of them failed, so a broken
+    # conversion is never finalized as a complete upload.
+
+    def __init__(self, command: str):
+        self.processes = []
+        stdin = None
+        for part in command.split(" | "):
+            process = subprocess.Popen(shlex.split(part), stdin=stdin, stdout=subprocess.PIPE)
+            if stdin is not None:
+                stdin.close()  # let the previous process get SIGPIPE if this one exits
+            stdin = process.stdout
+            self.processes.append(process)
+        self.stdout = stdin
+
+    def read(self, size: int) -> bytes:
+        data = self.stdout.read(size)
+        if not data:
+            for process in self.processes:
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, process.args)
+        return data
+
+    def close(self):
+        self.stdout.close()
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+
+def open_process_stream(command_template: str, video_id: str) -> ProcessOutputStream:
+    command_to_run = command_template.format(video_id=video_id)
+    print(f"Executing (streaming): {command_to_run}")
+    return ProcessOutputStream(command_to_run)
+
+
 class PodcastManager:
 
     def __init__(self, root_folder_name="gdrive-cast"):
-        ET.register_namespace('itunes', 'http://www.itunes.com/dtds/podcast-1.0.dtd')
+        ET.register_namespace('itunes', ITUNES_NAMESPACE)
+        ET.register_namespace('atom', ATOM_NAMESPACE)
+        ET.register_namespace('fh', HISTORY_NAMESPACE)
 
         self.config = configparser.ConfigParser()
         self.config.read('config.ini')
 
         self.root_folder_name = root_folder_name
-        self.gauth = self._auth()
-        self.drive = GoogleDrive(self.gauth)
-        self.youtube = discovery.build('youtube', 'v3', credentials=self.gauth.credentials)
-        self.root = self.get_or_create_folder(self.root_folder_name, 'root')
+        # authentication, API clients and the root folder are set up on first use
+        self._lazy_lock = threading.RLock()
+        self.index = DriveIndex()
+        self.jobs = JobQueue()
+        # every Drive and YouTube request goes through here
+        self.api = ApiGateway(self.config, self.index)
+        # called with (bytes sent, total bytes, seconds elapsed) while large files are uploaded
+        self.upload_progress = print_upload_progress
+
+        # when set, cached transcripts and chapters are ignored (and replaced with fresh results)
+        self.bypass_cache = False
+        self.transcript_cache = FileCache(
+            TRANSCRIPT_CACHE_FOLDER, self.config.getint('app', 'transcript_cache_max_mb', fallback=200) * 1024 * 1024)
+        self.chapters_cache = FileCache(
+            CHAPTERS_CACHE_FOLDER, self.config.getint('app', 'chapters_cache_max_mb', fallback=20) * 1024 * 1024)
+        # converted audio and downloaded feeds
+        self.media_cache = FileCache(
+            MEDIA_CACHE_FOLDER, self.config.getint('app', 'media_cache_max_mb', fallback=2048) * 1024 * 1024)
+        self.feed_cache = FileCache(
+            FEED_CACHE_FOLDER, self.config.getint('app', 'feed_cache_max_mb', fallback=100) * 1024 * 1024)
+
+        self._channel_locks = {}
+        self._channel_locks_guard = threading.Lock()
+
+    @lazy_property
+    def gauth(self) -> GoogleAuth:
+        with tracer.span("auth"):
+            return self._auth()
+
+    @lazy_property
+    def drive(self) -> GoogleDrive:
+        from pydrive2.drive import GoogleDrive
+        return GoogleDrive(self.gauth)
+
+    @lazy_property
+    def youtube(self):
+        from googleapiclient import discovery
+        # the discovery document bundled with the client library is used, no network fetch
+        return discovery.build('youtube', 'v3', credentials=self.gauth.credentials,
+                               static_discovery=True, cache_discovery=False)
+
+    @lazy_property
+    def metadata(self) -> YouTubeMetadata:
+        return YouTubeMetadata(
+            self.youtube,
+            self.api,
+            FileCache(CHANNEL_CACHE_FOLDER, 10 * 1024 * 1024),
+            self.config.getint('app', 'channel_cache_ttl_hours', fallback=24) * 3600)
+
+    @lazy_property
+    def root(self) -> GoogleDriveFile:
+        return self.get_or_create_folder(self.root_folder_name, 'root')
 
     def _auth(self) -> GoogleAuth:
+        from pydrive2.auth import GoogleAuth
         gauth = GoogleAuth()
 
         gauth.LoadCredentialsFile()
@@ -152,161 +1486,869 @@ class PodcastManager:
 
         return None
 
-    def list_podcast_folders_sorted(self):
-        return self.drive.ListFile({
-            'q': f"'{self.root['id']}' in parents and trashed=false and mimeType='{FOLDER_TYPE}'",
-            'orderBy': 'folder'
-        }).GetList()
+    def list_podcast_folders_sorted(self, refresh: bool = False) -> list[GoogleDriveFile]:
+        # Channel indexes refer to the order of the last listing, so unless asked to refresh,
+        # the folders are served from the local index.
+        if not refresh and self.index.is_listed(self.root['id']):
+            return [self._indexed_file(e) for e in self.index.children(self.root['id'], FOLDER_TYPE)]
+
+        root_id = self.root['id']
+        with tracer.span("drive.list"):
+            folders = self.api.execute("drive", lambda: self.drive.ListFile({
+                'q': f"'{root_id}' in parents and trashed=false and mimeType='{FOLDER_TYPE}'",
+                'orderBy': 'folder'
+            }).GetList())
+        self.index.replace_children(self.root['id'], folders, FOLDER_TYPE)
+        return folders
+
+    def list_folder_children(self, folder_ids: list[str]) -> dict[str, list[GoogleDriveFile]]:
+        # one query per PARENTS_QUERY_BATCH_SIZE folders instead of one per folder
+        children = {folder_id: [] for folder_id in folder_ids}
+        for i in range(0, len(folder_ids), PARENTS_QUERY_BATCH_SIZE):
+            chunk = folder_ids[i:i + PARENTS_QUERY_BATCH_SIZE]
+            parents = " or ".join(f"'{folder_id}' in parents" for folder_id in chunk)
+            for remote_file in self.api.execute(
+                    "drive", lambda: self.drive.ListFile({'q': f"({parents}) and trashed=false"}).GetList()):
+                for parent in remote_file['parents']:
+                    if parent['id'] in children:
+                        children[parent['id']].append(remote_file)
+        return children
+
+    def refresh_index(self):
+        # validate the local index against Drive and replace its content
+        print("Refreshing local Drive index...")
+        stale = 0
+        folders = self.list_podcast_folders_sorted(refresh=True)
+        for folder_id, remote_files in self.list_folder_children([f['id'] for f in folders]).items():
+            indexed = {e['title']: e for e in self.index.children(folder_id)}
+            remote = {f['title']: f for f in remote_files}
+            for title in indexed.keys() | remote.keys():
+                e, f = indexed.get(title), remote.get(title)
+                if e is None or f is None or e['id'] != f['id'] or e['md5'] != f.get('md5Checksum'):
+                    stale += 1
+            self.index.replace_children(folder_id, remote_files)
+        print(f"Index refreshed: {len(folders)} channel folder(s), {stale} stale entr{'y' if stale == 1 else 'ies'} fixed")
+
+    def find_file(self, title: str, parent_folder_id: str, refresh: bool = False) -> GoogleDriveFile | None:
+        # Read-through lookup: local index first, then Drive. The first miss in a channel folder lists
+        # the whole folder, so later lookups there (found or not) are answered by the index; the root
+        # folder is only listed by list_podcast_folders_sorted, which sets the channel order.
+        # With refresh, Drive is asked directly, for when the index is known to be stale.
+        if not refresh:
+            entry = self.index.get(parent_folder_id, title)
+            if entry:
+                return self._indexed_file(entry)
+            if self.index.is_listed(parent_folder_id):
+                return None
+            if parent_folder_id != self.root['id']:
+                self.index.replace_children(parent_folder_id, self.list_folder_children([parent_folder_id])[parent_folder_id])
+                entry = self.index.get(parent_folder_id, title)
+                return self._indexed_file(entry) if entry else None
+
+        file_list = self.api.execute("drive", lambda: self.drive.ListFile({
+            'q': f"title='{title}' and '{parent_folder_id}' in parents and trashed=false"
+        }).GetList())
+        if not file_list:
+            return None
+        self.index.put(parent_folder_id, file_list[0])
+        return file_list[0]
+
+    def _indexed_file(self, entry: dict) -> GoogleDriveFile:
+        metadata = {
+            'id': entry['id'],
+            'title': entry['title'],
+            'parents': [{'id': entry['parent_id']}],
+            'mimeType': entry['mime_type'],
+        }
+        if entry['md5']:
+            metadata['md5Checksum'] = entry['md5']
+        if entry['size'] is not None:
+            metadata['fileSize'] = entry['size']
+        return self._remote_file(metadata)
+
+    def _remote_file(self, metadata: dict) -> GoogleDriveFile:
+        # a file object for an existing Drive file, without fetching its metadata
+        remote_file = self.drive.CreateFile()
+        remote_file.UpdateMetadata(metadata)
+        remote_file.uploaded = True
+        return remote_file
 
     def fetch_library_data(self):
+        library = sorted(self.iter_library_data(), key=lambda channel: channel['position'])
+        self.save_library_cache(library)
+        return library
+
+    def iter_library_data(self):
+        # Yields channels one at a time, as soon as each manifest is available (cached or downloaded),
+        # so the caller can show them progressively. 'position' is the order in the full listing,
+        # 'version' changes whenever the channel feed changes.
         print("Fetching podcast data...")
-        podcast_folders = self.list_podcast_folders_sorted()
+        podcast_folders = self.list_podcast_folders_sorted(refresh=True)
 
         if not os.path.exists(FEED_CACHE_FOLDER):
             os.makedirs(FEED_CACHE_FOLDER)
 
-        library = []
-
-        index = 1
-        for f in podcast_folders:
-            remote_feed_files = self.drive.ListFile({
-                'q': f"title='{FEED_FILE_NAME}' and '{f['id']}' in parents and trashed=false"
-            }).GetList()
-
+        channel_files = {folder_id: files for folder_id, files in self.find_feed_files(
+            [f['id'] for f in podcast_folders]).items() if FEED_FILE_NAME in files}
+        positions = {folder_id: n for n, folder_id in enumerate(
+            f['id'] for f in podcast_folders if f['id'] in channel_files)}
+        cache_names = [f"{folder_id}-{MANIFEST_FILE_NAME}" for folder_id in channel_files]
+
+        # only the small per-channel manifests are read; a feed is only downloaded to rebuild
+        # a missing or stale manifest
+        workers = self.config.getint('app', 'feed_download_workers', fallback=8)
+        sources = Counter()
+        with self.feed_cache.pinned(*cache_names), ThreadPoolExecutor(max_workers=workers) as pool:
+            downloads = {
+                pool.submit(self.fetch_manifest, folder_id, files): folder_id
+                for folder_id, files in channel_files.items()
+            }
+            for future in as_completed(downloads):
+                folder_id = downloads[future]
+                manifest, source = future.result()
+                sources[source] += 1
+                yield self._read_library_channel(folder_id, positions[folder_id], manifest)
+        print(f"Manifests: {len(channel_files)}, downloaded: {sources['downloaded']}, cached: {sources['cached']}, "
+              f"rebuilt: {sources['rebuilt']}")
+        self.feed_cache.evict()
+
+    def fetch_manifest(self, folder_id: str, files: dict[str, GoogleDriveFile]) -> tuple[dict, str]:
+        # Returns the channel manifest and where it came from: "cached", "downloaded" or "rebuilt".
+        # A manifest is up to date when it was written for the current feed.xml (same MD5).
+        remote_feed_file = files[FEED_FILE_NAME]
+        remote_manifest_file = files.get(MANIFEST_FILE_NAME)
+        manifest_file = f"{FEED_CACHE_FOLDER}/{folder_id}-{MANIFEST_FILE_NAME}"
+        if remote_manifest_file:
+            downloaded = self.fetch_feed_file(remote_manifest_file, manifest_file)
+            manifest = read_manifest(manifest_file)
+            if manifest and manifest.get('feed_md5') == remote_feed_file.get('md5Checksum'):
+                return manifest, "downloaded" if downloaded else "cached"
+
+        print(f"Rebuilding channel manifest: {folder_id}")
+        local_feed_file = f"{FEED_CACHE_FOLDER}/{folder_id}.xml"
+        with self.feed_cache.pinned(f"{folder_id}.xml"):
+            self.fetch_feed_file(remote_feed_file, local_feed_file)
+            archives = sorted((f for title, f in files.items() if archive_number(title) is not None),
+                              key=lambda f: archive_number(f['title']))
+            write_manifest(manifest_file, self.manifest_from_feed(folder_id, local_feed_file, archives))
+            return self.upload_manifest(folder_id, local_feed_file), "rebuilt"
+
+    def manifest_from_feed(self, folder_id: str, feed_file: str, remote_archive_files: list[GoogleDriveFile]) -> dict:
+        # episodes of the archive pages (oldest page first), then those of the feed;
+        # 'feed_md5' is set when the manifest is uploaded (upload_manifest)
+        with tracer.span("manifest.build", size=os.path.getsize(feed_file)):
             episodes = []
-            if remote_feed_files:
-                remote_feed_file = remote_feed_files[0]
-                local_feed_file = f"{FEED_CACHE_FOLDER}/{f['id']}.xml"
-                remote_feed_file.GetContentFile(local_feed_file)
-                tree = ET.parse(local_feed_file)
-                channel = tree.getroot().find('channel')
-                # print(f"\n{index}. Channel: {f['title']} - {channel.find('title').text}")
-                index += 1
-
-                for item in channel.findall('item'):
-                    episodes.append({
-                        'id': str(index),
-                        'title': item.find('title').text,
-                        'date': item.find('pubDate').text
-                    })
-
-                library.append({'id': f['id'], 'title': channel.find('title').text, 'episodes': episodes})
-
-        return library
+            for remote_file in remote_archive_files:
+                local_archive_file = f"{FEED_CACHE_FOLDER}/{folder_id}-{remote_file['title']}"
+                self.fetch_feed_file(remote_file, local_archive_file)
+                episodes += read_feed_episodes(local_archive_file)[1]
+            title, feed_episodes = read_feed_episodes(feed_file)
+        return {'feed_md5': None, 'title': title, 'episodes': episodes + feed_episodes}
+
+    def load_manifest(self, folder_id: str) -> dict | None:
+        remote_manifest_file = self.find_file(MANIFEST_FILE_NAME, folder_id)
+        if not remote_manifest_file:
+            return None
+        manifest_file = f"{FEED_CACHE_FOLDER}/{folder_id}-{MANIFEST_FILE_NAME}"
+        self.fetch_feed_file(remote_manifest_file, manifest_file)
+        return read_manifest(manifest_file)
+
+    def upload_manifest(self, folder_id: str, feed_file: str) -> dict | None:
+        # uploads the local manifest if it has changes not uploaded yet, marked as written for the feed file
+        manifest_file = f"{FEED_CACHE_FOLDER}/{folder_id}-{MANIFEST_FILE_NAME}"
+        manifest = read_manifest(manifest_file)
+        if manifest is None or manifest.get('feed_md5') is not None:
+            return manifest
+        manifest['feed_md5'] = file_md5(feed_file)
+        write_manifest(manifest_file, manifest)
+        self.upload_file(manifest_file, MANIFEST_FILE_NAME, folder_id)
+        return manifest
+
+    @staticmethod
+    def _read_library_channel(folder_id: str, position: int, manifest: dict) -> dict:
+        episodes = []
+        for episode in manifest['episodes']:
+            episodes.append({
+                'id': str(position + 2),
+                'title': episode['title'],
+                'date': episode['date']
+            })
+
+        return {'id': folder_id, 'title': manifest['title'], 'episodes': episodes,
+                'position': position, 'version': manifest['feed_md5']}
+
+    @staticmethod
+    def load_library_cache() -> list[dict]:
+        # the library as of the last complete listing, for instant display
+        try:
+            with open(LIBRARY_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    @staticmethod
+    def save_library_cache(library: list[dict]):
+        tmp_file = LIBRARY_CACHE_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(library, f, ensure_ascii=False)
+        os.replace(tmp_file, LIBRARY_CACHE_FILE)
+
+    def find_feed_files(self, folder_ids: list[str]) -> dict[str, dict[str, GoogleDriveFile]]:
+        # Returns the feed, manifest and archive pages of each folder, by title.
+        # One query per PARENTS_QUERY_BATCH_SIZE folders instead of one per folder.
+        feed_files = {}
+        for i in range(0, len(folder_ids), PARENTS_QUERY_BATCH_SIZE):
+            chunk = folder_ids[i:i + PARENTS_QUERY_BATCH_SIZE]
+            parents = " or ".join(f"'{folder_id}' in parents" for folder_id in chunk)
+            for remote_file in self.api.execute("drive", lambda: self.drive.ListFile({
+                'q': f"(title='{FEED_FILE_NAME}' or title='{MANIFEST_FILE_NAME}' or title contains '{FEED_ARCHIVE_PREFIX}')"
+                     f" and ({parents}) and trashed=false"
+            }).GetList()):
+                title = remote_file['title']
+                if title not in (FEED_FILE_NAME, MANIFEST_FILE_NAME) and archive_number(title) is None:
+                    continue
+                for parent in remote_file['parents']:
+                    if parent['id'] in chunk and title not in feed_files.setdefault(parent['id'], {}):
+                        feed_files[parent['id']][title] = remote_file
+                        self.index.put(parent['id'], remote_file)
+        return feed_files
+
+    def find_archive_files(self, folder_id: str) -> list[GoogleDriveFile]:
+        # the channel's archive pages, oldest first
+        if self.index.is_listed(folder_id):
+            archives = [self._indexed_file(e) for e in self.index.children(folder_id)]
+        else:
+            archives = self.api.execute("drive", lambda: self.drive.ListFile({
+                'q': f"title contains '{FEED_ARCHIVE_PREFIX}' and '{folder_id}' in parents and trashed=false"
+            }).GetList())
+            for remote_file in archives:
+                self.index.put(folder_id, remote_file)
+        return sorted((f for f in archives if archive_number(f['title']) is not None),
+                      key=lambda f: archive_number(f['title']))
+
+    def fetch_feed_file(self, remote_feed_file: GoogleDriveFile, local_feed_file: str) -> bool:
+        # returns False when the local copy already matches the remote file
+        if is_same_content(local_feed_file, remote_feed_file):
+            # keep the cached copy from being evicted
+            os.utime(local_feed_file)
+            return False
+        with tracer.span("feed.download", file=remote_feed_file['id']):
+            self.api.execute("drive", lambda: remote_feed_file.GetContentFile(local_feed_file))
+            tracer.transferred(received=os.path.getsize(local_feed_file))
+        return True
 
     def upload_file(self, file_path, file_name, folder_id) -> str:
-
-        # check whether the file already exists
-        query = f"title = '{file_name}' and '{folder_id}' in parents and trashed = false"
-        file_list = self.drive.ListFile({'q': query}).GetList()
-        if file_list:
+        is_feed = file_name == FEED_FILE_NAME or archive_number(file_name) is not None
+        with tracer.span("feed.upload" if is_feed else "upload",
+                         file=file_name, size=os.path.getsize(file_path)):
+            return self._upload_file(file_path, file_name, folder_id)
+
+    def _upload_file(self, file_path, file_name, folder_id, retry_stale: bool = True) -> str:
+        from pydrive2.files import ApiRequestError
+
+        # check whether the file already exists; a retry does not trust the index
+        remote_file = self.find_file(file_name, folder_id, refresh=not retry_stale)
+        if remote_file and is_same_content(file_path, remote_file):
+            print(f"Unchanged, skipping upload: {file_name}")
+            return self._share_file(remote_file, False)
+        if remote_file:
             print(f"Overriding existing file: {file_name}")
-            remote_file = file_list[0]
             created = False
         else:
             print(f"Creating a new file: {file_name}")
-            remote_file = self.drive.CreateFile({'parents': [{'id': folder_id}]})
+            remote_file = self.drive.CreateFile({'title': file_name, 'parents': [{'id': folder_id}]})
             created = True
 
         size = os.path.getsize(file_path)
         print(f"Uploading file: {file_name}, size={humanize.naturalsize(size, binary=True)}")
 
-        remote_file.SetContentFile(file_path)
-        remote_file.Upload()
+        try:
+            chunk_size = self.config.getint('app', 'upload_chunk_size_mb', fallback=8) * 1024 * 1024
+            if size > chunk_size:
+                remote_file = self._resumable_upload(file_path, remote_file, file_name, folder_id, chunk_size)
+            elif created:
+                # a lost response to the insert must not lead to a second file with the same title
+                remote_file = self._upload_content(
+                    remote_file, file_path, already_done=lambda: self.find_file(file_name, folder_id, refresh=True))
+            else:
+                self._upload_content(remote_file, file_path)
+        except (ApiRequestError, UploadError) as e:
+            status = e.status if isinstance(e, UploadError) else ApiGateway._error_status(e)[0]
+            if created or not retry_stale or status != 404:
+                raise
+            # the indexed file has been removed on Drive, look it up again
+            print(f"Existing file not found, retrying: {file_name}")
+            self.index.remove(remote_file['id'])
+            return self._upload_file(file_path, file_name, folder_id, retry_stale=False)
+        self.index.put(folder_id, remote_file)
+        return self._share_file(remote_file, created)
+
+    def _upload_content(self, remote_file: GoogleDriveFile, file_path: str, already_done=None) -> GoogleDriveFile:
+        # the content is set again for every attempt, since a failed attempt may have consumed it
+        def upload():
+            remote_file.SetContentFile(file_path)
+            remote_file.Upload()
+            return remote_file
+        return self.api.execute("drive", upload, sent=os.path.getsize(file_path), already_done=already_done)
+
+    def upload_stream(self, stream, file_name, folder_id) -> tuple[str, int]:
+        # uploads everything read from the stream; returns the direct link and the number of bytes uploaded
+        remote_file = self.find_file(file_name, folder_id)
+        created = remote_file is None
+        print(f"{'Creating a new' if created else 'Overriding existing'} file (streaming): {file_name}")
+
+        upload = ResumableUpload(
+            self.gauth.Get_Http_Object(),
+            None,
+            metadata={'title': file_name, 'parents': [{'id': folder_id}]},
+            file_id=None if created else remote_file['id'],
+            chunk_size=self.config.getint('app', 'upload_chunk_size_mb', fallback=8) * 1024 * 1024,
+            max_retries=self.config.getint('app', 'upload_max_retries', fallback=5),
+            progress=self.upload_progress,
+            rate_limiter=self.api.buckets['drive'],
+        )
+        remote_file = self._remote_file(upload.run_stream(stream))
+        self.index.put(folder_id, remote_file)
+        print(f"Streamed file: {file_name}, size={humanize.naturalsize(upload.total_size, binary=True)}")
+        return self._share_file(remote_file, created), upload.total_size
 
+    def _share_file(self, remote_file: GoogleDriveFile, created: bool) -> str:
         # print(f"Uploaded file: `{file_to_upload}`")
-        direct_link = f"https://drive.usercontent.google.com/download?export=download&confirm=t&id={remote_file['id']}"
-        print(f"Uploaded file (direct link): {direct_link}")
+        link = direct_link(remote_file['id'])
+        print(f"Uploaded file (direct link): {link}")
 
         # add "Anyone with link" permission
         if created:
-            remote_file.InsertPermission({
+            self.api.execute("drive", lambda: remote_file.InsertPermission({
                 'type': 'anyone',
                 'value': 'anyone',
                 'role': 'reader'}
-            )
+            ), already_done=lambda: next((p for p in remote_file.GetPermissions() if p.get('type') == 'anyone'), None))
             print('Added permission: "Anyone with link"')
 
-        return direct_link
+        return link
+
+    def _resumable_upload(self, file_path, remote_file: GoogleDriveFile, file_name, folder_id, chunk_size) -> GoogleDriveFile:
+        upload = ResumableUpload(
+            self.gauth.Get_Http_Object(),
+            file_path,
+            metadata={'title': file_name, 'parents': [{'id': folder_id}]},
+            file_id=remote_file.get('id'),
+            chunk_size=chunk_size,
+            max_retries=self.config.getint('app', 'upload_max_retries', fallback=5),
+            session_uri=self.index.get_upload_session(folder_id, file_name, file_path),
+            on_session=lambda uri: self.index.put_upload_session(folder_id, file_name, file_path, uri),
+            progress=self.upload_progress,
+            rate_limiter=self.api.buckets['drive'],
+        )
+        metadata = upload.run()
+        self.index.remove_upload_session(folder_id, file_name)
+        return self._remote_file(metadata)
 
-    def delete_podcast(self, channel_index: int):
+    def delete_podcast(self, channel_index: int, dry_run: bool = False) -> bool:
         ch = self.find_channel_folder(channel_index)
-        if ch:
-            ch.Delete()
+        if not ch:
+            print(f"Channel folder not found: {channel_index}")
+            return False
+
+        if dry_run:
+            # deleting the folder removes everything in it with a single request
+            file_list = self.list_folder_children([ch['id']])[ch['id']]
+            self._print_deletion_plan(file_list)
+            return True
+
+        self._delete_with_retry(ch)
+        self.index.remove(ch['id'])
+        return True
+
+    def delete_files(self, files: list[GoogleDriveFile]) -> tuple[list[GoogleDriveFile], list[tuple[GoogleDriveFile, str]]]:
+        # deletes files concurrently; returns (deleted files, [(failed file, error)])
+        deleted, failed = [], []
+        workers = self.config.getint('app', 'delete_workers', fallback=8)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._delete_with_retry, f): f for f in files}
+            for future in as_completed(futures):
+                f = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append((f, f"{type(e).__name__}: {e}"))
+                    continue
+                self.index.remove(f['id'])
+                deleted.append(f)
+                print(f"Deleted file: {f['title']}")
+        return deleted, failed
+
+    def _delete_with_retry(self, remote_file: GoogleDriveFile):
+        from pydrive2.files import ApiRequestError
+        max_retries = self.config.getint('app', 'delete_max_retries', fallback=3)
+        with tracer.span("delete", file=remote_file['title']):
+            try:
+                self.api.execute("drive", remote_file.Delete, max_retries=max_retries)
+            except ApiRequestError as e:
+                if e.GetField('code') != 404:
+                    raise
+                # already gone
+
+    @staticmethod
+    def _print_deletion_plan(files: list[GoogleDriveFile]):
+        size = sum(int(f.get('fileSize', 0)) for f in files)
+        for f in files:
+            print(f"Would delete: {f['title']} ({humanize.naturalsize(int(f.get('fileSize', 0)), binary=True)})")
+        print(f"Would delete {len(files)} file(s), freeing {humanize.naturalsize(size, binary=True)}")
 
     def get_timestamps(self, video_url) -> str:
         return self.get_timestamps_by_video_id(extract_video_id(video_url))
 
     def get_timestamps_by_video_id(self, video_id) -> str:
+        model = self.config['app']['llm_model']
+        window_seconds = self.config.getint('app', 'transcript_window_seconds', fallback=30)
+        chunk_tokens = self.config.getint('app', 'llm_chunk_tokens', fallback=30000)
+        with open(CHAPTERS_PROMPT_FILE, "r") as f:
+            prompt = f.read()
+
+        # chapters depend on the video, the model, the prompt and how the transcript is prepared
+        chapters_key = hashlib.sha256("\0".join([
+            video_id, model, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), str(window_seconds), str(chunk_tokens)
+        ]).encode("utf-8")).hexdigest() + ".txt"
+        if not self.bypass_cache:
+            chapters = self.chapters_cache.get(chapters_key)
+            if chapters is not None:
+                print(f"Using cached chapters for: {video_id} ({model})")
+                return "\nTimestamps:\n" + chapters
+
+        # imported only past the cache lookup, the import alone takes seconds
+        from litellm import token_counter
+        started = time.monotonic()
+
         # first, extract the transcript for the video
-        print(f"Getting transcript for: {video_id}")
-        ytt_api = YouTubeTranscriptApi()
-        formatter = MyFormatter()
-        transcript = ytt_api.fetch(video_id, languages=["ru", "en"])
+        transcript = self.get_transcript(video_id)
+        formatter = transcript_formatter_class()()
         text_output = formatter.format_transcript(transcript)
         # print(text_output)
         print(f"Successfully loaded transcript: {humanize.naturalsize(len(text_output), binary=True)}")
+        tokens_before = token_counter(model=model, text=text_output)
+
+        # merge caption snippets into time windows to cut the token count
+        windows = compact_transcript(transcript, window_seconds) if window_seconds > 0 \
+            else [(snippet.start, snippet.text) for snippet in transcript]
+        compacted = format_windows(windows)
+        tokens_after = token_counter(model=model, text=compacted)
+        print(f"Transcript tokens: {tokens_before} -> {tokens_after} after compaction")
 
         # then, use LLM to create chapters
-        model = self.config['app']['llm_model']
         print(f"Creating chapters using: {model}")
         os.environ[self.config['app']['llm_api_key_type']] = self.config['app']['llm_api_key']
-        with open("chapters_prompt.txt", "r") as f:
-            prompt = f.read()
-        content = prompt + text_output
-        response = completion(
-            model=model,
-            messages=[{"role": "user", "content": content}]
-        )
-        return "\nTimestamps:\n" + response.choices[0].message.content
+        if tokens_after <= chunk_tokens:
+            chapters = self._complete(model, prompt + compacted)
+        else:
+            # map: chapter each part concurrently, reduce: merge the lists
+            max_chars = len(compacted) * chunk_tokens // tokens_after
+            chunks = split_windows(windows, max_chars)
+            print(f"Long transcript, creating chapters for {len(chunks)} parts in parallel...")
+            workers = self.config.getint('app', 'llm_workers', fallback=4)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                chapter_lists = list(pool.map(
+                    lambda part: self._complete(model, self._part_prompt(prompt, part[0], len(chunks), part[1])),
+                    enumerate(chunks, start=1)))
+            chapters = merge_chapter_lists(chapter_lists)
+
+        print(f"Created chapters in {time.monotonic() - started:.1f}s")
+        if not chapters.strip():
+            # not cached, so the next run asks the LLM again
+            print(f"No chapters created for: {video_id}")
+            return ""
+        self.chapters_cache.put(chapters_key, chapters)
+        return "\nTimestamps:\n" + chapters
+
+    @staticmethod
+    def _part_prompt(prompt: str, part: int, parts: int, windows: list[tuple[float, str]]) -> str:
+        start, end = format_timestamp(windows[0][0]), format_timestamp(windows[-1][0])
+        note = (f"Note: this is part {part} of {parts} of the transcript, covering {start} to {end}. "
+                f"Create chapters for this part only and keep the original timestamps.\n\n")
+        return note + prompt + format_windows(windows)
+
+    @staticmethod
+    def _complete(model: str, content: str) -> str:
+        from litellm import completion
+        with tracer.span("llm", model=model, prompt_chars=len(content)) as span:
+            response = completion(
+                model=model,
+                messages=[{"role": "user", "content": content}]
+            )
+            span.bytes_sent += len(content.encode("utf-8"))
+            usage = getattr(response, 'usage', None)
+            if usage:
+                span.attributes['prompt_tokens'] = usage.prompt_tokens
+                span.attributes['completion_tokens'] = usage.completion_tokens
+        return response.choices[0].message.content
+
+    def get_transcript(self, video_id) -> list[FetchedTranscriptSnippet]:
+        from youtube_transcript_api import FetchedTranscriptSnippet, YouTubeTranscriptApi
+        # raw transcript snippets, cached by video ID and requested languages
+        cache_key = f"{video_id}.{'-'.join(TRANSCRIPT_LANGUAGES)}.json"
+        if not self.bypass_cache:
+            cached = self.transcript_cache.get(cache_key)
+            if cached is not None:
+                print(f"Using cached transcript for: {video_id}")
+                return [FetchedTranscriptSnippet(**snippet) for snippet in json.loads(cached)]
 
-    def purge_podcast(self, channel_index: int):
+        print(f"Getting transcript for: {video_id}")
+        ytt_api = YouTubeTranscriptApi()
+        with tracer.span("transcript", video_id=video_id):
+            transcript = ytt_api.fetch(video_id, languages=TRANSCRIPT_LANGUAGES)
+        snippets = list(transcript)
+        self.transcript_cache.put(cache_key, json.dumps(transcript.to_raw_data(), ensure_ascii=False))
+        return snippets
+
+    def purge_podcast(self, channel_index: int, dry_run: bool = False) -> bool:
+        # returns False if some episodes could not be deleted
         ch = self.find_channel_folder(channel_index)
         if not ch:
             print(f"Channel folder not found: {channel_index}")
-            return
+            return False
 
-        file_list = self.drive.ListFile({
+        file_list = self.api.execute("drive", lambda: self.drive.ListFile({
             'q': f"'{ch['id']}' in parents and trashed=false"
-        }).GetList()
+        }).GetList())
 
         if not file_list:
             print(f"Channel folder not found: {channel_index}")
-            return
+            return False
+
+        remote_feed_file = next((f for f in file_list if f['title'] == FEED_FILE_NAME), None)
+        # archive pages are removed together with the episodes they list, once the feed no longer links them
+        archive_files = sorted((f for f in file_list if remote_feed_file and archive_number(f['title']) is not None),
+                               key=lambda f: archive_number(f['title']))
+        feed_ids = {f['id'] for f in archive_files}
+        if remote_feed_file:
+            # the manifest is rewritten along with the feed
+            feed_ids |= {f['id'] for f in file_list if f['title'] in (FEED_FILE_NAME, MANIFEST_FILE_NAME)}
+        episode_files = [f for f in file_list if f['id'] not in feed_ids]
+
+        if dry_run:
+            self._print_deletion_plan(episode_files + archive_files)
+            return True
+
+        deleted, failed = self.delete_files(episode_files)
+        freed = sum(int(f.get('fileSize', 0)) for f in deleted)
+        print(f"Deleted {len(deleted)} file(s), freed {humanize.naturalsize(freed, binary=True)}")
+        for f, error in failed:
+            print(f"Failed to delete: {f['title']}: {error}")
+
+        # the feed is only updated after the deletes, and keeps the episodes whose files are still there
+        if remote_feed_file:
+            local_feed_file = f"{FEED_CACHE_FOLDER}/{ch['id']}.xml"
+            os.makedirs(FEED_CACHE_FOLDER, exist_ok=True)
+            kept_ids = {f['id'] for f, _ in failed}
+
+            def keep(item: ET.Element) -> bool:
+                enclosure = item.find('enclosure')
+                return drive_file_id_from_link(enclosure.get('url') if enclosure is not None else None) in kept_ids
+
+            with self.feed_cache.pinned(f"{ch['id']}.xml", f"{ch['id']}-{MANIFEST_FILE_NAME}",
+                                        *(f"{ch['id']}-{f['title']}" for f in archive_files)):
+                self.fetch_feed_file(remote_feed_file, local_feed_file)
+
+                print(f"Updating channel: {remote_feed_file['title']} - {read_feed_title(local_feed_file)}")
+
+                # the kept episodes of the archive pages go back to the main feed
+                archived_items = []
+                for remote_file in archive_files:
+                    local_archive_file = f"{FEED_CACHE_FOLDER}/{ch['id']}-{remote_file['title']}"
+                    self.fetch_feed_file(remote_file, local_archive_file)
+                    with tracer.span("feed.parse", size=os.path.getsize(local_archive_file)):
+                        items = ET.parse(local_archive_file).getroot().find('channel').findall('item')
+                    for item in items:
+                        if keep(item):
+                            archived_items.append(item)
+                        else:
+                            print(f"Deleted episode: {item.findtext('title')}")
+
+                with tracer.span("feed.write", size=os.path.getsize(local_feed_file)):
+                    removed = remove_feed_items(local_feed_file, keep=keep)
+                    if archive_files:
+                        tree = ET.parse(local_feed_file)
+                        channel = tree.getroot().find('channel')
+                        set_feed_link(channel, "prev-archive", None)
+                        first_item = channel.find('item')
+                        position = list(channel).index(first_item) if first_item is not None else len(channel)
+                        channel[position:position] = archived_items
+                        ET.indent(tree, space="\t", level=0)
+                        tree.write(local_feed_file, encoding="utf-8", xml_declaration=True)
+                for title in removed:
+                    print(f"Deleted episode: {title}")
 
-        for f in file_list:
-            if f['title'] == "feed.xml":
-                remote_feed_file = f
-                local_feed_file = f"{FEED_CACHE_FOLDER}/{f['id']}.xml"
-                remote_feed_file.GetContentFile(local_feed_file)
-                tree = ET.parse(local_feed_file)
-                channel = tree.getroot().find('channel')
+                size = os.path.getsize(local_feed_file)
+                print(f"Uploading feed file: {remote_feed_file['title']}, size={humanize.naturalsize(size, binary=True)}")
+                with tracer.span("feed.upload", file=FEED_FILE_NAME, size=size):
+                    self._upload_content(remote_feed_file, local_feed_file)
+                self.index.put(ch['id'], remote_feed_file)
 
-                print(f"Updating channel: {f['title']} - {channel.find('title').text}")
+                print(f"Updated feed file: {remote_feed_file['title']}")
 
-                episodes = channel.findall('item')
-                for episode in episodes:
-                    print(f"Deleted episode: {episode.find('title').text}")
-                    channel.remove(episode)
+                # the archive pages are merged into the feed, so it alone describes the channel now
+                write_manifest(f"{FEED_CACHE_FOLDER}/{ch['id']}-{MANIFEST_FILE_NAME}",
+                               self.manifest_from_feed(ch['id'], local_feed_file, []))
+                self.upload_manifest(ch['id'], local_feed_file)
+            self.feed_cache.evict()
 
-                ET.indent(tree, space="\t", level=0)
-                tree.write(local_feed_file, encoding="utf-8", xml_declaration=True)
+            if archive_files:
+                deleted, archive_failed = self.delete_files(archive_files)
+                print(f"Deleted {len(deleted)} archive page(s)")
+                for f, error in archive_failed:
+                    print(f"Failed to delete: {f['title']}: {error}")
+                failed += archive_failed
 
-                size = os.path.getsize(local_feed_file)
-                print(f"Uploading feed file: {f['title']}, size={humanize.naturalsize(size, binary=True)}")
-                remote_feed_file.SetContentFile(local_feed_file)
-                remote_feed_file.Upload()
-
-                print(f"Updated feed file: {f['title']}")
-            else:
-                f.Delete()
-                print(f"Deleted file: {f['title']}")
+        return not failed
 
     def download_podcast(self, video_url: str, add_generated_timestamps):
         video_id = extract_video_id(video_url)
         print(f"Video ID: {video_id}")
 
-        video = YouTubeVideo(youtube=self.youtube, video_id=video_id)
+        episode = self.fetch_episode_metadata(video_id)
+        self.process_episode(episode)
+        feed_link = self.publish_episode(episode, add_generated_timestamps)
+        print(f"Feed link: {feed_link}")
+
+    def download_podcasts(self, sources: list[str], add_generated_timestamps,
+                          process_workers: int = None, upload_workers: int = None) -> list[BatchItem]:
+        # Staged pipeline: metadata (batched API calls in this thread, the YouTube client is not thread-safe),
+        # then a pool of external converter processes, then a pool of Drive uploads.
+        # An episode is handed to the upload pool as soon as its own conversion finishes.
+        process_workers = process_workers or self.config.getint('app', 'batch_process_workers', fallback=2)
+        upload_workers = upload_workers or self.config.getint('app', 'batch_upload_workers', fallback=4)
+
+        if not self.config['app'].get('youtube_process_command'):
+            print("No external command configured. Skipping.")
+            sys.exit(-1)
+
+        items = self.resolve_batch_items(sources)
+        print(f"Batch: {len(items)} video(s), {process_workers} converter(s), {upload_workers} uploader(s)")
+
+        episodes = {}
+        pending = [item for item in items if not item.error]
+        for item in pending:
+            item.stage = "metadata"
+        try:
+            episodes_by_id = self.fetch_episodes_metadata([item.video_id for item in pending])
+        except Exception as e:
+            episodes_by_id = {}
+            for item in pending:
+                item.fail(e)
+        for item in pending:
+            if item.video_id in episodes_by_id:
+                episodes[item] = episodes_by_id[item.video_id]
+                item.title = episodes[item].video.title
+            elif not item.error:
+                item.error = "Video not found"
+
+        with ThreadPoolExecutor(max_workers=process_workers) as process_pool, \
+                ThreadPoolExecutor(max_workers=upload_workers) as upload_pool:
+
+            def process(batch_item, ep):
+                batch_item.stage = "process"
+                self.process_episode(ep)
+
+            def publish(batch_item, ep):
+                batch_item.stage = "upload"
+                with tracer.span("publish", video_id=batch_item.video_id):
+                    self.publish_episode(ep, add_generated_timestamps)
+                batch_item.stage = "done"
+
+            process_futures = {process_pool.submit(process, item, ep): item for item, ep in episodes.items()}
+            upload_futures = {}
+            for future in as_completed(process_futures):
+                item = process_futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    item.fail(e)
+                    continue
+                upload_futures[upload_pool.submit(publish, item, episodes[item])] = item
+
+            for future in as_completed(upload_futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    upload_futures[future].fail(e)
+
+        return items
+
+    def resolve_batch_items(self, sources: list[str]) -> list[BatchItem]:
+        items = []
+        seen = set()
+        for source in sources:
+            playlist_id = extract_playlist_id(source)
+            if playlist_id:
+                try:
+                    video_ids = self.list_playlist_video_ids(playlist_id)
+                except Exception as e:
+                    items.append(BatchItem(source, error=f"{type(e).__name__}: {e}"))
+                    continue
+                print(f"Playlist {playlist_id}: {len(video_ids)} video(s)")
+            else:
+                parsed = parse_qs(urlparse(source).query)
+                if "youtube" not in urlparse(source).netloc or "v" not in parsed:
+                    items.append(BatchItem(source, error="Not a YouTube video or playlist URL"))
+                    continue
+                video_ids = [parsed['v'][0]]
+
+            for video_id in video_ids:
+                if video_id not in seen:
+                    seen.add(video_id)
+                    items.append(BatchItem(source, video_id=video_id))
+
+        return items
+
+    def list_playlist_video_ids(self, playlist_id: str) -> list[str]:
+        video_ids = []
+        page_token = None
+        while True:
+            response = self.api.execute("youtube", lambda: self.youtube.playlistItems().list(
+                part='contentDetails', playlistId=playlist_id, maxResults=50, pageToken=page_token
+            ).execute())
+            video_ids.extend(item['contentDetails']['videoId'] for item in response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return video_ids
+
+    def sync_channels(self, add_generated_timestamps, dry_run: bool = False) -> list[BatchItem]:
+        # Finds uploads that are not in the podcast yet for every channel folder and downloads them.
+        # Per channel, the newest processed upload (high-water mark) and the ETag of the first page of
+        # the uploads playlist are stored, so an unchanged channel costs one conditional request.
+        folders = [f for f in self.list_podcast_folders_sorted() if f['title'].startswith("UC")]
+        existing = self.list_episode_video_ids([f['id'] for f in folders])
+        max_new = self.config.getint('app', 'sync_max_new_videos', fallback=10)
+
+        pending = {}
+        for folder in folders:
+            channel_id = folder['title']
+            state = self.index.get_sync_state(channel_id)
+            try:
+                result = self._find_new_uploads(channel_id, state, existing[folder['id']], max_new)
+            except QuotaExceededError as e:
+                print(f"{e}, not checking the remaining channels")
+                break
+            if result is None:
+                print(f"{channel_id}: no changes")
+                continue
+
+            new_video_ids, etag, mark = result
+            print(f"{channel_id}: {len(new_video_ids)} new video(s)")
+            if new_video_ids:
+                pending[channel_id] = (new_video_ids, etag, mark)
+            elif not dry_run:
+                self.index.put_sync_state(channel_id, etag, *mark)
+
+        if dry_run or not pending:
+            for channel_id, (new_video_ids, _, _) in pending.items():
+                for video_id in new_video_ids:
+                    print(f" - https://www.youtube.com/watch?v={video_id}")
+            return []
+
+        urls = [f"https://www.youtube.com/watch?v={video_id}" for ids, _, _ in pending.values() for video_id in ids]
+        items = self.download_podcasts(urls, add_generated_timestamps)
+
+        # advance the high-water mark only when everything newer was published,
+        # otherwise the failed videos are picked up again on the next run
+        ok = {item.video_id for item in items if item.ok}
+        for channel_id, (new_video_ids, etag, mark) in pending.items():
+            if all(video_id in ok for video_id in new_video_ids):
+                self.index.put_sync_state(channel_id, etag, *mark)
+        return items
+
+    def _find_new_uploads(self, channel_id: str, state: dict | None, existing: set[str], max_new: int):
+        # Returns (new video IDs, oldest first; ETag; high-water mark as (video ID, published at)) or None
+        # if the uploads did not change. The scan stops at the first upload published no later than the mark,
+        # so it still stops when the mark video itself was deleted or made private.
+        # With more than max_new new videos, the oldest ones are taken and the mark is the newest of them,
+        # without an ETag, so the next run continues with the rest. A channel without any episodes
+        # (a first sync after --purge, for example) only gets its newest max_new uploads.
+        from googleapiclient.errors import HttpError
+        playlist_id = "UU" + channel_id[2:]
+        last_published = parse_published(state['last_published']) if state and state['last_published'] else None
+        new_videos = []
+        etag = newest = None
+        page_token = None
+        done = False
+        while not done:
+            request = self.youtube.playlistItems().list(
+                part='contentDetails', playlistId=playlist_id, maxResults=50, pageToken=page_token)
+            if page_token is None and state and state['etag']:
+                request.headers['If-None-Match'] = state['etag']
+            try:
+                response = self.api.execute("youtube", request.execute)
+            except HttpError as e:
+                if e.resp.status == 304:
+                    return None
+                raise
+            if page_token is None:
+                etag = response.get('etag')
+
+            for item in response.get('items', []):
+                details = item['contentDetails']
+                if 'videoPublishedAt' not in details:
+                    # scheduled or not yet processed
+                    continue
+                video = (details['videoId'], details['videoPublishedAt'])
+                newest = newest or video
+                if state and (video[0] == state['last_video_id'] or
+                              last_published and parse_published(video[1]) <= last_published):
+                    done = True
+                    break
+                if video[0] in existing:
+                    if not state:
+                        # first sync: only what is newer than the newest episode we already have
+                        done = True
+                        break
+                    continue
+                new_videos.append(video)
+                if not state and not existing and len(new_videos) >= max_new:
+                    done = True
+                    break
+
+            page_token = response.get('nextPageToken')
+            done = done or not page_token
+
+        if len(new_videos) > max_new:
+            oldest = new_videos[-max_new:]
+            return [video_id for video_id, _ in reversed(oldest)], None, oldest[0]
+        return [video_id for video_id, _ in reversed(new_videos)], etag, newest or (None, None)
+
+    def list_episode_video_ids(self, folder_ids: list[str]) -> dict[str, set[str]]:
+        # episode files are named {video_id}.mp3; folders missing from the index are listed in batches
+        unlisted = [folder_id for folder_id in folder_ids if not self.index.is_listed(folder_id)]
+        for folder_id, remote_files in self.list_folder_children(unlisted).items():
+            self.index.replace_children(folder_id, remote_files)
+
+        return {
+            folder_id: {e['title'][:-len(".mp3")] for e in self.index.children(folder_id) if e['title'].endswith(".mp3")}
+            for folder_id in folder_ids
+        }
+
+    def fetch_episode_metadata(self, video_id: str) -> PodcastEpisode:
+        episodes = self.fetch_episodes_metadata([video_id])
+        if video_id not in episodes:
+            raise ValueError(f"Video not found: {video_id}")
+        return episodes[video_id]
+
+    def fetch_episodes_metadata(self, video_ids: list[str]) -> dict[str, PodcastEpisode]:
+        # one videos().list call per 50 videos, and channels that are not cached in one more call
+        with tracer.span("metadata", videos=len(video_ids)):
+            videos = self.metadata.get_videos(video_ids)
+            channels = self.metadata.get_channels([v.channel_id for v in videos.values()], bypass_cache=self.bypass_cache)
+
+        episodes = {}
+        for video_id, video in videos.items():
+            if video.channel_id in channels:
+                episodes[video_id] = PodcastEpisode(video, channels[video.channel_id])
+                self._print_episode(episodes[video_id])
+        return episodes
+
+    @staticmethod
+    def _print_episode(episode: PodcastEpisode):
+        video, channel = episode.video, episode.channel
 
         print("--- Video Details ---")
         print(f"Title: {video.title}")
@@ -317,47 +2359,296 @@ class PodcastManager:
         # print("\n--- Description ---")
         # print(video.description)
 
-        channel_folder = self.get_or_create_folder(video.channel_id, self.root['id'])
-        print(f"Using channel folder: {channel_folder['title']} ({channel_folder['id']})")
-
-        channel = YouTubeChannel(self.youtube, channel_id=video.channel_id)
         print("--- Channel ---")
         print(f"Title: {channel.title}")
         print(f"Description: {channel.description}")
         print(f"Banner: {channel.banner_url}")
         print(f"URL: {channel.url}")
 
-        process_command_template = self.config['app']['youtube_process_command']
-        audio_file_name = f"{video_id}.mp3"
-        audio_file_path = process_file(process_command_template, video_id)
-        print(f"Saved file to {audio_file_path}")
+    def streaming_enabled(self) -> bool:
+        # without a stream command the total size must be known up front, so the temp file path is used
+        return self.config.getboolean('app', 'stream_upload', fallback=False) \
+            and bool(self.config.get('app', 'youtube_stream_command', fallback=''))
+
+    def process_episode(self, episode: PodcastEpisode):
+        # a rerun after a partial failure finds the audio uploaded by the earlier run
+        if not self.bypass_cache:
+            remote_audio_file = self.find_episode_audio(episode.video)
+            if remote_audio_file is not None:
+                episode.remote_audio_file = remote_audio_file
+                episode.audio_file_size = int(remote_audio_file['fileSize'])
+                print(f"Audio already on Drive, skipping conversion: {remote_audio_file['title']}")
+                return
+        if self.streaming_enabled():
+            # the converter runs while uploading, see publish_episode
+            return
+        # the audio stays pinned in media-cache until publish_episode has uploaded it
+        audio_file_name = f"{episode.video.id}.mp3"
+        self.media_cache.pin(audio_file_name)
+        try:
+            audio_file_path = self.media_cache.path(audio_file_name)
+            if not self.bypass_cache and self.media_cache.touch(audio_file_name) and os.path.getsize(audio_file_path):
+                print(f"Using cached audio: {audio_file_path}")
+                episode.audio_file_path = audio_file_path
+                episode.audio_file_size = os.path.getsize(audio_file_path)
+                return
+            process_command_template = self.config['app']['youtube_process_command']
+            with tracer.span("process_file", video_id=episode.video.id) as span:
+                episode.audio_file_path = process_file(process_command_template, episode.video.id)
+                episode.audio_file_size = os.path.getsize(episode.audio_file_path)
+                span.attributes['size'] = episode.audio_file_size
+        except BaseException:
+            self.media_cache.unpin(audio_file_name)
+            raise
+        print(f"Saved file to {episode.audio_file_path}")
+
+    def find_episode_audio(self, video: YouTubeVideo) -> GoogleDriveFile | None:
+        # the uploaded audio of a video, if any (uploads are only visible once complete)
+        channel_folder = self.find_file(video.channel_id, self.root['id'])
+        if channel_folder is None:
+            return None
+        remote_file = self.find_file(f"{video.id}.mp3", channel_folder['id'])
+        if remote_file is None or not int(remote_file.get('fileSize') or 0):
+            return None
+        return remote_file
+
+    def publish_episode(self, episode: PodcastEpisode, add_generated_timestamps) -> str:
+        channel_folder, audio_link = self.upload_episode_audio(episode)
+        return self.publish_feed(episode, channel_folder, audio_link, add_generated_timestamps)
+
+    def upload_episode_audio(self, episode: PodcastEpisode) -> tuple[GoogleDriveFile, str]:
+        # returns the channel folder and the direct link of the audio
+        try:
+            return self._upload_episode_audio(episode)
+        finally:
+            if episode.audio_file_path:
+                self.media_cache.unpin(os.path.basename(episode.audio_file_path))
+            self.media_cache.evict()
+
+    def _upload_episode_audio(self, episode: PodcastEpisode) -> tuple[GoogleDriveFile, str]:
+        video = episode.video
+
+        # serialize folder creation and feed read-modify-write per channel
+        with self._channel_lock(video.channel_id):
+            channel_folder = self.get_or_create_folder(video.channel_id, self.root['id'])
+            print(f"Using channel folder: {channel_folder['title']} ({channel_folder['id']})")
+
+        audio_file_name = f"{video.id}.mp3"
+        if episode.remote_audio_file is not None:
+            audio_link = self._share_file(episode.remote_audio_file, False)
+        elif episode.audio_file_path:
+            audio_link = self.upload_file(episode.audio_file_path, audio_file_name, channel_folder['id'])
+        else:
+            with tracer.span("upload", file=audio_file_name, streamed=True):
+                stream = open_process_stream(self.config['app']['youtube_stream_command'], video.id)
+                try:
+                    audio_link, episode.audio_file_size = self.upload_stream(stream, audio_file_name, channel_folder['id'])
+                finally:
+                    stream.close()
+        return channel_folder, audio_link
+
+    def publish_feed(self, episode: PodcastEpisode, channel_folder: GoogleDriveFile, audio_link: str,
+                     add_generated_timestamps) -> str:
+        # adds the episode to the channel feed and uploads it; returns the feed link
+        video = episode.video
+        try:
+            with self._channel_lock(video.channel_id), self.feed_cache.pinned(
+                    f"{channel_folder['id']}.xml", f"{channel_folder['id']}-{MANIFEST_FILE_NAME}"):
+                feed_file = f"{FEED_CACHE_FOLDER}/{channel_folder['id']}.xml"
+                self.create_or_append_feed_file(feed_file, channel_folder['id'], episode.channel, video, audio_link, episode.audio_file_size, add_generated_timestamps)
+                self.archive_feed_items(feed_file, channel_folder['id'])
+                feed_link = self.upload_file(feed_file, FEED_FILE_NAME, channel_folder['id'])
+                # the manifest goes after the feed, so it is never newer than the feed it describes
+                self.upload_manifest(channel_folder['id'], feed_file)
+                return feed_link
+        finally:
+            self.feed_cache.evict()
+
+    def archive_feed_items(self, feed_file: str, folder_id: str):
+        # Keeps the main feed at most feed_window_size items long: the oldest items are moved, a page
+        # at a time, into archive pages that are never changed again (RFC 5005 archived feeds).
+        # The feed links to the newest page, and each page to the one before it.
+        window = self.config.getint('app', 'feed_window_size', fallback=100)
+        page_size = max(1, self.config.getint('app', 'feed_archive_page_size', fallback=50))
+        if window <= 0 or count_feed_items(feed_file) <= window:
+            return
 
-        feed_file = FEED_FILE_NAME
-        audio_link = self.upload_file(audio_file_path, audio_file_name, channel_folder['id'])
-        self.create_or_append_feed_file(feed_file, channel_folder['id'], channel, video, audio_link, audio_file_path, add_generated_timestamps)
-        feed_link = self.upload_file(feed_file, feed_file, channel_folder['id'])
-        print(f"Feed link: {feed_link}")
+        with tracer.span("feed.archive", size=os.path.getsize(feed_file)):
+            tree = ET.parse(feed_file)
+            channel = tree.getroot().find('channel')
+            # items are appended in the order episodes are added, not in publishing order
+            items = sorted(channel.findall('item'), key=item_published)
+            pages = -(-(len(items) - window) // page_size)
+
+            # Pages after the one the feed links to were written by an attempt whose feed upload failed;
+            # they are not linked from anywhere, so they are written again instead of adding duplicates.
+            archives = self.find_archive_files(folder_id)
+            prev_link = next((link.get('href') for link in channel.findall(f"{{{ATOM_NAMESPACE}}}link")
+                              if link.get('rel') == "prev-archive"), None)
+            linked = next((f for f in archives if f['id'] == drive_file_id_from_link(prev_link)), None)
+            number = archive_number(linked['title']) if linked else 0
+            prev_link = prev_link if linked else None
+            remote_feed_file = self.find_file(FEED_FILE_NAME, folder_id)
+            current_link = direct_link(remote_feed_file['id']) if remote_feed_file else None
+
+            for page_items in (items[n * page_size:(n + 1) * page_size] for n in range(pages)):
+                number += 1
+                archive_name = archive_file_name(number)
+                print(f"Archiving {len(page_items)} episode(s) to {archive_name}")
+                archive_file = f"{FEED_CACHE_FOLDER}/{folder_id}-{archive_name}"
+                write_archive_page(archive_file, channel, page_items, current_link, prev_link)
+                prev_link = self.upload_file(archive_file, archive_name, folder_id)
+                for item in page_items:
+                    channel.remove(item)
+
+            set_feed_link(channel, "prev-archive", prev_link)
+            ET.indent(tree, space="\t", level=0)
+            tree.write(feed_file, encoding="utf-8", xml_declaration=True)
+
+            unlinked = [f for f in archives if archive_number(f['title']) > number]
+            if unlinked:
+                deleted, _ = self.delete_files(unlinked)
+                print(f"Deleted {len(deleted)} unlinked archive page(s)")
+
+    def enqueue(self, sources: list[str], add_generated_timestamps) -> list[BatchItem]:
+        # adds a job per video (playlists are expanded); the worker (run_worker) runs them
+        items = self.resolve_batch_items(sources)
+        for item in items:
+            if item.error:
+                continue
+            job_id, created = self.jobs.add(item.video_id, item.source, add_generated_timestamps)
+            item.title = f"job {job_id}" + ("" if created else " (already queued)")
+            item.stage = "done"
+        return items
+
+    def run_worker(self, workers: int, exit_when_idle: bool = False, poll_seconds: float = 5):
+        # Runs queued jobs with a number of worker threads until interrupted (or, with exit_when_idle,
+        # until the queue is empty). Only one worker process should use the queue at a time.
+        requeued = self.jobs.requeue_running()
+        if requeued:
+            print(f"Resuming {requeued} interrupted job(s)")
+        print(f"Worker started: {workers} worker thread(s)")
+        stop = threading.Event()
+
+        def work():
+            while not stop.is_set():
+                job = self.jobs.claim()
+                if job is None:
+                    if exit_when_idle:
+                        return
+                    stop.wait(poll_seconds)
+                    continue
+                self.run_job(job)
+
+        threads = [threading.Thread(target=work, name=f"job-worker-{n}", daemon=True) for n in range(workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            # running jobs are resumed from their last stage by the next worker
+            print("Stopping worker...")
+            stop.set()
+
+    def run_job(self, job: dict):
+        max_attempts = self.config.getint('app', 'job_max_attempts', fallback=3)
+        print(f"Job {job['id']}: {job['video_id']} (stage: {job['stage']}, attempt {job['attempts']})")
+        try:
+            with tracer.span("job", job_id=job['id'], stage=job['stage']):
+                feed_link = self._run_job_stages(job)
+        except Exception as e:
+            retry = job['attempts'] < max_attempts
+            self.jobs.fail(job['id'], f"{type(e).__name__}: {e}", retry)
+            print(f"Job {job['id']} failed{', will retry' if retry else ''}: {type(e).__name__}: {e}")
+            return
+        print(f"Job {job['id']} done, feed link: {feed_link}")
+
+    def _run_job_stages(self, job: dict) -> str:
+        episode = self.fetch_episode_metadata(job['video_id'])
+        self.jobs.checkpoint(job['id'], job['stage'], title=episode.video.title)
+
+        if job['stage'] in ("queued", "downloaded"):
+            # after a restart at "downloaded", the audio is found in media-cache
+            self.process_episode(episode)
+            self.jobs.checkpoint(job['id'], "downloaded")
+            channel_folder, audio_link = self.upload_episode_audio(episode)
+            self.jobs.checkpoint(job['id'], "uploaded", audio_link=audio_link, audio_file_size=episode.audio_file_size)
+        else:
+            # the audio is on Drive already, only the feed is left
+            with self._channel_lock(episode.video.channel_id):
+                channel_folder = self.get_or_create_folder(episode.video.channel_id, self.root['id'])
+            audio_link, episode.audio_file_size = job['audio_link'], job['audio_file_size']
+
+        feed_link = self.publish_feed(episode, channel_folder, audio_link, bool(job['add_timestamps']))
+        self.jobs.checkpoint(job['id'], "feed_updated", feed_link=feed_link)
+        return feed_link
 
-    def create_or_append_feed_file(self, feed_file, parent_folder_id, youtube_channel: YouTubeChannel, video: YouTubeVideo, audio_link, audio_file_path, add_generated_timestamps):
+    def _channel_lock(self, channel_id: str) -> threading.Lock:
+        with self._channel_locks_guard:
+            return self._channel_locks.setdefault(channel_id, threading.Lock())
 
-        # remove local feed if exists
-        if os.path.exists(feed_file):
-            os.remove(feed_file)
+    def create_or_append_feed_file(self, feed_file, parent_folder_id, youtube_channel: YouTubeChannel, video: YouTubeVideo, audio_link, audio_file_size: int, add_generated_timestamps):
 
-        # download the existing feed.xml from Google Drive if exists
+        os.makedirs(os.path.dirname(feed_file) or ".", exist_ok=True)
 
-        remote_feed_files = self.drive.ListFile({
-            'q': f"title='{feed_file}' and '{parent_folder_id}' in parents and trashed=false"
-        }).GetList()
+        # download the existing feed.xml from Google Drive if exists and the local copy is outdated
 
-        if remote_feed_files:
-            remote_feed_file = remote_feed_files[0]
+        remote_feed_file = self.find_file(FEED_FILE_NAME, parent_folder_id)
+
+        if remote_feed_file:
             size_str = humanize.naturalsize(remote_feed_file.get('fileSize', 0), binary=True)
-            print(f"Downloading remote feed file: {feed_file} ({size_str})...")
-            remote_feed_file.GetContentFile(feed_file)
+            if self.fetch_feed_file(remote_feed_file, feed_file):
+                print(f"Downloaded remote feed file: {FEED_FILE_NAME} ({size_str})")
+            else:
+                print(f"Using cached feed file: {FEED_FILE_NAME} ({size_str})")
+
+        manifest = self.load_manifest(parent_folder_id) if remote_feed_file else None
+        if manifest and manifest.get('feed_md5') != remote_feed_file.get('md5Checksum'):
+            manifest = None
+
+        # a rerun for the same audio file must not add the episode twice; the manifest also
+        # lists the episodes moved to archive pages
+        if remote_feed_file and (feed_has_guid(feed_file, audio_link) or
+                                 any(e.get('guid') == audio_link for e in (manifest or {}).get('episodes', []))):
+            print(f"Episode already in feed: {video.title}")
+            return
+
+        podcast_description = video.description
+        # optionally add generated chapters / timestamps
+        if add_generated_timestamps:
+            timestamps = self.get_timestamps_by_video_id(video.id)
+            podcast_description += "\n" + timestamps
+            print(f" ----- ")
+            print(f" Added generated chapters:\n\n{timestamps}")
+            print(f" ----- ")
+
+        item = build_feed_item(video, podcast_description, audio_link, audio_file_size)
+        self._add_feed_item(feed_file, remote_feed_file, youtube_channel, item)
+
+        # the manifest is updated along with the feed and uploaded after it (upload_manifest);
+        # a missing or outdated one is rebuilt from the feed
+        episode = {'title': item.findtext('title'), 'date': item.findtext('pubDate'), 'guid': audio_link}
+        if manifest:
+            manifest['episodes'].append(episode)
+            manifest['feed_md5'] = None
+        elif remote_feed_file:
+            manifest = self.manifest_from_feed(parent_folder_id, feed_file, self.find_archive_files(parent_folder_id))
+        else:
+            manifest = {'feed_md5': None, 'title': youtube_channel.title, 'episodes': [episode]}
+        write_manifest(f"{FEED_CACHE_FOLDER}/{parent_folder_id}-{MANIFEST_FILE_NAME}", manifest)
+
+    @staticmethod
+    def _add_feed_item(feed_file: str, remote_feed_file: GoogleDriveFile | None, youtube_channel: YouTubeChannel, item: ET.Element):
+        if remote_feed_file:
+            with tracer.span("feed.write", size=os.path.getsize(feed_file)):
+                if append_feed_item(feed_file, item):
+                    return
 
             print("Parsing existing feed...")
-            tree = ET.parse(feed_file)
+            with tracer.span("feed.parse", size=os.path.getsize(feed_file)):
+                tree = ET.parse(feed_file)
             channel = tree.getroot().find('channel')
         else:
             print("Creating new feed file...")
@@ -379,36 +2670,22 @@ class PodcastManager:
             ET.SubElement(channel, "itunes:category", text='Politics')
             ET.SubElement(channel, "itunes:image", href=youtube_channel.banner_url)
 
-        audio_file_size = os.path.getsize(audio_file_path)
-
-        podcast_description = video.description
-        # optionally add generated chapters / timestamps
-        if add_generated_timestamps:
-            timestamps = self.get_timestamps_by_video_id(video.id)
-            podcast_description += "\n" + timestamps
-            print(f" ----- ")
-            print(f" Added generated chapters:\n\n{timestamps}")
-            print(f" ----- ")
-
-        item = ET.SubElement(channel, "item")
-        ET.SubElement(item, "title").text = video.title
-        ET.SubElement(item, "description").text = podcast_description
-        ET.SubElement(item, "itunes:explicit").text = 'no'
-        ET.SubElement(item, "enclosure", url=audio_link, length=f'{audio_file_size}', type="audio/mpeg")
-        ET.SubElement(item, "guid").text = audio_link
-        video_date = datetime.fromisoformat(video.published)
-        ET.SubElement(item, "pubDate").text = format_datetime(video_date)
+        channel.append(item)
 
-        ET.indent(tree, space="\t", level=0)
-        tree.write(feed_file, encoding="utf-8", xml_declaration=True)
+        with tracer.span("feed.write"):
+            ET.indent(tree, space="\t", level=0)
+            tree.write(feed_file, encoding="utf-8", xml_declaration=True)
 
     def get_or_create_folder(self, name, parent_folder_id) -> GoogleDriveFile:
-        roots = self.drive.ListFile({
-            'q': f"title='{name}' and '{parent_folder_id}' in parents and trashed=false and mimeType='{FOLDER_TYPE}'"
-        }).GetList()
+        entry = self.index.get(parent_folder_id, name)
+        if entry and entry['mime_type'] == FOLDER_TYPE:
+            return self._indexed_file(entry)
 
-        if roots:
-            return roots[0]
+        if not self.index.is_listed(parent_folder_id):
+            folder = self._query_folder(name, parent_folder_id)
+            if folder:
+                self.index.put(parent_folder_id, folder)
+                return folder
 
         # If the list is empty, the folder doesn't exist.
         print(f"Folder '{name}' not found. Creating a new one...")
@@ -418,6 +2695,20 @@ class PodcastManager:
             'mimeType': FOLDER_TYPE
         }
         folder = self.drive.CreateFile(folder_metadata)
-        folder.Upload()
+
+        def create():
+            folder.Upload()
+            return folder
+        # a lost response to the insert must not lead to a second folder with the same name
+        folder = self.api.execute("drive", create, already_done=lambda: self._query_folder(name, parent_folder_id))
+        self.index.put(parent_folder_id, folder)
+        # a new folder is empty, so its (empty) listing is complete
+        self.index.replace_children(folder['id'], [])
         print(f"Folder '{folder['title']}' created with ID: {folder['id']}")
-        return folder
\ No newline at end of file
+        return folder
+
+    def _query_folder(self, name, parent_folder_id) -> GoogleDriveFile | None:
+        folders = self.api.execute("drive", lambda: self.drive.ListFile({
+            'q': f"title='{name}' and '{parent_folder_id}' in parents and trashed=false and mimeType='{FOLDER_TYPE}'"
+        }).GetList())
+        return folders[0] if folders else None
\ No newline at end of file